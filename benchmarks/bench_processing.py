@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of lpy.processing functions.
+
+Run from root: python benchmarks/bench_processing.py
+"""
+import sys
+import timeit
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from lpy.processing import smooth  # pylint: disable=wrong-import-position
+
+
+def bench_smooth(sizes=(100_000, 1_000_000, 5_000_000),
+                 params=((151, 11), (71, 11), (5, 1)), repeat=3):
+    """ Compares smooth engines with reference iterative fftconvolve """
+    rng = np.random.default_rng(0)
+    engines = ['fft', 'kernel', 'cumsum', 'auto']
+    print(f"{'size':>9} {'avg':>4} {'n':>3} "
+          + ''.join(f'{engine:>10}' for engine in engines) + '   speedup')
+    for size in sizes:
+        x = rng.normal(size=size).cumsum()
+        for avg, n in params:
+            times = {}
+            for engine in engines:
+                timer = timeit.Timer(lambda: smooth(x, avg, n, engine=engine))
+                times[engine] = min(timer.repeat(repeat=repeat, number=1))
+            print(f'{size:>9} {avg:>4} {n:>3} '
+                  + ''.join(f'{times[e]*1000:>8.1f}ms' for e in engines)
+                  + f"   x{times['fft'] / times['auto']:.1f}")
+
+
+if __name__ == '__main__':
+    bench_smooth()
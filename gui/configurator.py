@@ -17,7 +17,7 @@ from PyQt5.QtGui import QIcon
 import yaml
 from .defaults import ICON_PATH, INFO
 from .utils import pop_up_window, verify_cfg
-from lpy import load, extract_shot_number
+from lpy import load, load_text, extract_shot_number, ShotCache
 
 class Configurator(QDialog):
     def __init__(self, parent=None):
@@ -126,14 +126,35 @@ class Configurator(QDialog):
                           selectable_text=True)
 
         if verify_cfg(self.cfg):
-            self.signals = load(None, self.cfg)
+            self.signals = load(None, self.cfg, cache=ShotCache())
             self.accept() # send signal to main window that ok button pushed
         else:
             pop_up_window("Ошибка загрузки данных",
                         "Проверьте наличие TDMS файла и корректность сигналов")
 
-    # def apply_txt_config(self):
+    def apply_txt_config(self):
+        """ Apply config with TXT file """
+        try:
+            # clear previous cfg
+            self.cfg = {}
+            # fill cfg with new data
+            self.fill_cfg_with_data()
+        except Exception as e:
+            pop_up_window("Ошибка", f"Не удалось загрузить файл:\n{str(e)}",
+                          selectable_text=True)
 
+        if verify_cfg(self.cfg):
+            try:
+                self.signals = load_text(None, self.cfg)
+            except Exception as e:
+                pop_up_window("Ошибка загрузки данных",
+                              f"Не удалось загрузить файл:\n{str(e)}",
+                              selectable_text=True)
+                return
+            self.accept() # send signal to main window that ok button pushed
+        else:
+            pop_up_window("Ошибка загрузки данных",
+                        "Проверьте наличие TXT файла и корректность сигналов")
 
     def ok_button_pushed(self):
         file_format = self.get_file_format(self.tdms_path_entry.text())
@@ -7,7 +7,7 @@ Created on Wed Apr  2 16:00:05 2025
 
 import yaml
 import numpy as np
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThreadPool
 from PyQt5.QtGui import QIcon
 import matplotlib.pyplot as plt
 import matplotlib.style as mplstyle
@@ -20,12 +20,17 @@ from matplotlib.backends.backend_qt5agg import (NavigationToolbar2QT
 from PyQt5.QtWidgets import (QWidget, QAction, QDialog, QSpinBox, QComboBox,
                              QMainWindow,QSizePolicy,QPushButton, QFormLayout,
                              QVBoxLayout, QRadioButton, QButtonGroup,
-                             QHBoxLayout, QDoubleSpinBox, QMenu, QFileDialog)
+                             QHBoxLayout, QDoubleSpinBox, QMenu, QFileDialog,
+                             QProgressBar)
 
 from .configurator import Configurator
-from .defaults import ICON_PATH, INFO, TIPS
-from .utils import (pop_up_window, verify_cfg, save_as_txt, align_signals)
-from lpy import PROBE_AREA_DEFAULT, TeNeAnalyzer, remove_negatives
+from .worker import AnalysisWorker, WorkerSignals
+from .lod import MinMaxPyramid, LodLine
+from .defaults import ICON_PATH, INFO, TIPS, WORKERS
+from .utils import (pop_up_window, verify_cfg, save_as_txt, align_signals,
+                    span_verts, add_span_collection, memo_get, memo_put)
+from lpy import (PROBE_AREA_DEFAULT, TeNeAnalyzer, ShotCache,
+                 remove_negatives, nearest_index)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -70,9 +75,40 @@ class MainWindow(QMainWindow):
 
         self.ctrl_is_held = False
 
-        # axes for preserving limits
+        # persistent axes and artists (see create_axes), limits of signals
+        # axes are kept between updates until autoscale is requested
         self.axes = None
-        self.xy_lims = None
+        self.autoscale = True
+        # Current-Voltage Plot window (figure, axes, lines), reused by clicks
+        self.cv_window = None
+        # plotted Te and ne (generation, probe_name, res_t, te, ne), saved
+        # by save_txt_te_ne without recalculation
+        self.te_ne = None
+
+        # TeNeAnalyzer of every probe with cached calculation stages
+        self.analyzers = {}
+        # min/max pyramids of plotted signals {id: (signal, pyramid)} and
+        # decimated lines of current plot, memos are changed only by GUI
+        # thread, worker gets their copies (see analyze)
+        self.pyramids = {}
+        # vertices of spans shading {id: (spans, verts)}
+        self.span_verts = {}
+        self.lod_lines = []
+
+        # analysis runs in one worker thread (analyzers are not shared by
+        # jobs), newer job number (generation) cancels older jobs
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+        self.generation = 0
+        self.worker_signals = WorkerSignals(self)
+        self.worker_signals.progress.connect(self.on_analysis_progress)
+        self.worker_signals.finished.connect(self.on_analysis_finished)
+        self.worker_signals.error.connect(self.on_analysis_error)
+        # progress of analysis in status bar
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
 
     def create_menu(self):
         """Create menu bar with File menu"""
@@ -104,6 +140,11 @@ class MainWindow(QMainWindow):
         saveAsMenu.addAction(saveTxtFpAction)
         file_menu.addMenu(saveAsMenu)
 
+        # Clear cache of loaded shots
+        clear_cache_action = QAction('Очистить кэш', self)
+        clear_cache_action.triggered.connect(self.clear_cache)
+        file_menu.addAction(clear_cache_action)
+
         # Help menu (manual)
         help_menu = menubar.addMenu('Помощь')
         # instruction action
@@ -134,6 +175,10 @@ class MainWindow(QMainWindow):
             # get information from configurator
             self.cfg = manager.get_cfg() # full cfg
             self.signals = manager.signals # loaded signals dict
+            self.analyzers = {}
+            self.pyramids = {}
+            self.span_verts = {}
+            self.autoscale = True
 
             # clear previous probes from qcombobox list
             self.probe.clear()
@@ -162,6 +207,10 @@ class MainWindow(QMainWindow):
             # get information from configurator
             self.cfg = manager.get_cfg() # full cfg
             self.signals = manager.signals # loaded signals dict
+            self.analyzers = {}
+            self.pyramids = {}
+            self.span_verts = {}
+            self.autoscale = True
 
             # clear previous probes from qcombobox list
             self.probe.clear()
@@ -177,6 +226,11 @@ class MainWindow(QMainWindow):
             self.update_plot()
 
 
+    def clear_cache(self):
+        """ Removes all loaded shots from on-disk cache """
+        ShotCache().clear()
+        pop_up_window('Кэш', 'Кэш загруженных файлов очищен')
+
     def open_instruction_pop_up(self):
         """ Open instruction main window """
         info = INFO['main_window_instruction']
@@ -363,6 +417,13 @@ class MainWindow(QMainWindow):
         self.canvas.setFocusPolicy(Qt.ClickFocus)
         self.canvas.setFocus()
         self.canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        # decimated signals depend on axes width
+        self.canvas.mpl_connect('resize_event', self.update_lod)
+        # connect event to open Current-Voltage Plot
+        self.canvas.mpl_connect('key_press_event', self.on_key_press)
+        self.canvas.mpl_connect('key_release_event', self.on_key_release)
+        self.canvas.mpl_connect('button_press_event',
+                                self.current_voltage_plot_on_ctrl_click)
         # Добавляем стандартный toolbar Matplotlib
         self.toolbar = NavigationToolbar(self.canvas, self)
         # Layout для графика и toolbar
@@ -379,17 +440,6 @@ class MainWindow(QMainWindow):
         if not hasattr(self, 'signals'):
             self.open_configurator()
         else:
-
-            if self.axes is not None:
-                # Save the original limits for the "Home" button
-                self.xy_lims = (self.axes[0].get_xlim(),
-                                self.axes[0].get_ylim())
-
-            # clear figure for replotting
-            self.figure.clear()
-            # create 3 rows axes for signals, te and ne
-            self.axes = self.figure.subplots(nrows=3, sharex=True)
-
             # get time, u, shot, probe_name, currents, fp_signals
             (self.t, self.u, self.shot, self.currents,
              self.fp_singals) = self.parse_signals_dict()
@@ -409,72 +459,51 @@ class MainWindow(QMainWindow):
                 'dt_range_te': (self.dt_te_min.value(), self.dt_te_max.value()),
                 }
 
+            # new update supersedes analysis in progress
+            self.generation += 1
+
             # Plotting
             if self.probe_name.endswith('.FP'):
                 # plot Floating Potential signal
-                self.plot_fp(self.t, self.u, self.fp_singals, self.shot,
-                          self.probe_name)
+                self.progress_bar.hide()
+                self.redraw(self.plot_fp, self.t, self.u, self.fp_singals,
+                            self.shot, self.probe_name)
             else:
-                # plot data Te ne
-                self.plot(self.t, self.u, self.currents, self.shot,
-                          self.probe_name, self.parameters)
-
-            # adjust margins
-            self.figure.subplots_adjust(
-                left=0.05, right=0.995, top=0.9, bottom=0.1)
-
-            # Restore zoom level
-            if self.xy_lims is not None:
-                self.axes[0].set_xlim(self.xy_lims[0])
-                self.axes[0].set_ylim(self.xy_lims[1])
-
-            # update viewport
-            self.canvas.draw()
-
-    def plot_fp(self, t, u, fp_signals, shot, probe_name):
-        """ Plot Floating Potential signals """
+                # calculate Te ne in worker thread, plot when finished
+                self.i = self.currents[self.probe_name]
+                tna = self.get_analyzer(self.t, self.u, self.currents,
+                                        self.probe_name)
+                worker = AnalysisWorker(self.worker_signals, self.generation,
+                                        self.is_current_generation,
+                                        self.analyze, tna, self.parameters,
+                                        dict(self.pyramids),
+                                        dict(self.span_verts))
+                self.progress_bar.setValue(0)
+                self.progress_bar.show()
+                self.pool.start(worker)
+
+    def create_axes(self):
+        """ Creates axes with artists once, plots only update their data """
+        # create 3 rows axes for signals, te and ne
+        self.axes = self.figure.subplots(nrows=3, sharex=True)
         ax1, ax2, ax3 = self.axes
-        # ax1 - signals
-        ax1.plot(t, u, label='Voltage, V')
-        ax1.plot(t, fp_signals[probe_name], label=f'{self.probe_name}, V')
-        ax1.set_ylabel('Voltage, V; Floating Potential, V')
-        ax1.set_title(f'#{self.shot}')
-        ax1.legend(loc='upper right')
+        # adjust margins
+        self.figure.subplots_adjust(
+            left=0.05, right=0.995, top=0.9, bottom=0.1)
+
+        # ax1 - signals decimated by current xlim and spans
+        empty = np.zeros(0)
+        self.lod_lines = []
+        for _ in range(2):
+            self.plot_lod(ax1, empty, empty)
+        self.spans_te_collection = add_span_collection(
+            ax1, np.zeros((0, 4, 2)), color='green', alpha=0.2)
+        self.spans_ne_collection = add_span_collection(
+            ax1, np.zeros((0, 4, 2)), color='red', alpha=0.2)
         ax1.grid()
 
-    def plot(self, t, u, currents, shot, probe_name, parameters):
-        """ Create interactive plot """
-        self.t, self.u, self.i = t, u, currents[probe_name]
-        # create TeNeAnalyzer instance
-        self.tna = TeNeAnalyzer(self.t, self.u, self.i)
-
-        # calculate Te, Ne using given parameters
-        res_t, te, ne, info = self.tna.calc_te_ne(parameters)
-
-        self.info = info
-
-        ax1, ax2, ax3 = self.axes
-        # ax1 - signals
-        t, u, i = self.tna.t, self.tna.u, self.tna.i
-        ax1.plot(t, u, label='Voltage, V')
-        ax1.plot(t, i, label=f'{self.probe_name}, mA')
-        # ax1.plot(t, tna.spandet.u_smooth, label='Voltage smoothed, V')
-        # ax1.plot(t, tna.spandet.di, label='Probe Current Gradient')
-        ax1.set_ylabel('Voltage, V; Probe Current, mA')
-        ax1.set_title(f'#{self.shot}')
-        ax1.legend(loc='upper right')
-        ax1.grid()
-
-        for span in self.tna.spans_te:
-            ax1.axvspan(t[span[0]], t[span[1]],
-                        color='green', alpha=0.2)
-
-        for span in self.tna.spans_ne:
-            ax1.axvspan(t[span[0]], t[span[1]],
-                        color='red', alpha=0.2)
-
         # ax2 - Te
-        ax2.plot(res_t, te, 'o', color='green')
+        self.te_line, = ax2.plot([], [], 'o', color='green')
         ax2.set_ylabel('Te, eV')
         ax2.grid()
         # Te errorbars
@@ -483,18 +512,186 @@ class MainWindow(QMainWindow):
         # capsize=5, color='green')
 
         # ax3 - ne
-        ax3.plot(res_t, ne, 'o', color='red')
+        self.ne_line, = ax3.plot([], [], 'o', color='red')
         ax3.set_xlabel('t, ms')
         ax3.set_ylabel('ne, 10^18 m^-3')
         ax3.grid()
 
-        # add red line cursor for axes
-        self.multi = MultiCursor(self.figure.canvas, self.axes, color='r', lw=1)
-        # connect event to open Current-Voltage Plot
-        self.figure.canvas.mpl_connect('key_press_event', self.on_key_press)
-        self.figure.canvas.mpl_connect('key_release_event', self.on_key_release)
-        self.figure.canvas.mpl_connect('button_press_event',
-                                       self.current_voltage_plot_on_ctrl_click)
+        # add red line cursor for axes, drawn by blitting
+        self.multi = MultiCursor(self.canvas, self.axes, useblit=True,
+                                 color='r', lw=1)
+
+    def redraw(self, plot_func, *args):
+        """ Updates artists by plot_func and rescales axes if needed """
+        if self.axes is None:
+            self.create_axes()
+        ax1, ax2, ax3 = self.axes
+
+        plot_func(*args)
+        ax1.legend(loc='upper right')
+
+        if self.autoscale:
+            # full time range of signals, then autoscale with margins
+            t = self.lod_lines[0].pyramid.t
+            if len(t):
+                ax1.set_xlim(t[0], t[-1])
+            ax1.relim()
+            ax1.autoscale()
+            self.autoscale = False
+            # zoom history of previous signals is dropped, so Home returns
+            # to new limits
+            self.toolbar.update()
+        # Te and ne are scaled for new values, zoom of time is kept
+        for ax in (ax2, ax3):
+            ax.relim()
+            ax.autoscale(axis='y')
+
+        # decimate signals for axes width
+        self.update_lod()
+        # update viewport, full draw as limits and ticks of Te and ne axes
+        # change with results (only the cursor is blitted)
+        self.canvas.draw_idle()
+
+    def update_lod(self, event=None):
+        """ Re-decimates plotted signals (on redraw and canvas resize) """
+        # pylint: disable=unused-argument
+        for lod_line in self.lod_lines:
+            lod_line.update()
+
+    def is_current_generation(self, generation):
+        """ Checks job is not superseded, called from worker thread """
+        return generation == self.generation
+
+    def get_pyramid(self, t, y):
+        """ MinMaxPyramid of signal, kept while signal is plotted """
+        return memo_put(self.pyramids, y, memo_get(
+            self.pyramids, y, lambda: MinMaxPyramid(t, y)))
+
+    def plot_lod(self, ax, t, y, **kwargs):
+        """ Plots signal decimated for axes width, updated on zoom """
+        lod_line = LodLine(ax, MinMaxPyramid(t, y), **kwargs)
+        ax.callbacks.connect('xlim_changed', lod_line.update)
+        # callbacks keep weak references
+        self.lod_lines.append(lod_line)
+
+    def analyze(self, tna, parameters, pyramids, verts, progress=None):
+        """
+        Calculates Te and ne, plot pyramids of signals and vertices of spans
+        shading in worker thread.
+
+        pyramids and verts are copies of memos, vertices are rebuilt only for
+        changed spans. New pyramids and vertices are returned and saved by
+        GUI thread (see plot).
+
+        Returns
+        -------
+        dict
+            Analyzer and finished arrays for plotting.
+        """
+        res_t, te, ne, info = tna.calc_te_ne(parameters, workers=WORKERS,
+                                             progress=progress)
+        pyramid_u, pyramid_i = (
+            memo_get(pyramids, y, lambda y=y: MinMaxPyramid(tna.t, y))
+            for y in (tna.u_smoothed, tna.i_smoothed))
+        return {'tna': tna, 't': tna.t,
+                'u': tna.u_smoothed, 'i': tna.i_smoothed,
+                'pyramid_u': pyramid_u, 'pyramid_i': pyramid_i,
+                'spans_te': tna.spans_te, 'spans_ne': tna.spans_ne,
+                'verts_te': memo_get(verts, tna.spans_te,
+                                     lambda: span_verts(tna.t, tna.spans_te)),
+                'verts_ne': memo_get(verts, tna.spans_ne,
+                                     lambda: span_verts(tna.t, tna.spans_ne)),
+                'cv_plot_data': tna.cv_plot_data,
+                'span_times': tna.span_times(),
+                'u_range': parameters['u_range'],
+                'res_t': res_t, 'te': te, 'ne': ne, 'info': info}
+
+    def on_analysis_progress(self, generation, done, total):
+        """ Shows progress of current analysis """
+        if generation == self.generation:
+            self.progress_bar.setMaximum(max(total, 1))
+            self.progress_bar.setValue(done)
+
+    def on_analysis_finished(self, generation, results):
+        """ Plots results of current analysis in GUI thread """
+        if generation != self.generation:
+            return
+        self.progress_bar.hide()
+        self.redraw(self.plot, results)
+
+    def on_analysis_error(self, generation, error):
+        """ Shows error of current analysis """
+        if generation != self.generation:
+            return
+        self.progress_bar.hide()
+        pop_up_window('Ошибка', error, selectable_text=True)
+
+    def closeEvent(self, event):
+        """ Cancels analysis in progress before closing """
+        self.generation += 1
+        self.pool.waitForDone()
+        super().closeEvent(event)
+
+    def plot_fp(self, t, u, fp_signals, shot, probe_name):
+        """ Plot Floating Potential signals """
+        # no analysis for Floating Potential
+        self.tna, self.cv_plot_data = None, []
+        self.te_ne = None
+        self.span_idx, self.span_times = np.zeros(0, dtype=int), np.zeros(0)
+        ax1 = self.axes[0]
+        # ax1 - signals
+        self.set_signal(0, t, u, 'Voltage, V')
+        self.set_signal(1, t, fp_signals[probe_name], f'{self.probe_name}, V')
+        ax1.set_ylabel('Voltage, V; Floating Potential, V')
+        ax1.set_title(f'#{self.shot}')
+        self.spans_te_collection.set_verts([])
+        self.spans_ne_collection.set_verts([])
+        self.te_line.set_data([], [])
+        self.ne_line.set_data([], [])
+
+    def set_signal(self, n, t, y, label, pyramid=None):
+        """
+        Replaces signal of n-th decimated line of signals axes, pyramid of
+        signal built by worker thread is saved if given.
+        """
+        if pyramid is None:
+            pyramid = self.get_pyramid(t, y)
+        else:
+            memo_put(self.pyramids, y, pyramid)
+        self.lod_lines[n].line.set_label(label)
+        self.lod_lines[n].set_pyramid(pyramid)
+
+    def plot(self, results):
+        """ Create interactive plot of analysis results (see analyze) """
+        self.tna, self.cv_plot_data = results['tna'], results['cv_plot_data']
+        res_t, te, ne = results['res_t'], results['te'], results['ne']
+        self.info = results['info']
+        self.te_ne = (self.generation, self.probe_name, res_t, te, ne)
+        # sorted times of spans for Ctrl+click search, prepared CV data
+        self.span_idx = np.flatnonzero(np.isfinite(results['span_times']))
+        self.span_times = results['span_times'][self.span_idx]
+        self.cv_u_range, self.cv_details = results['u_range'], {}
+
+        ax1 = self.axes[0]
+        # ax1 - signals
+        t, u, i = results['t'], results['u'], results['i']
+        self.set_signal(0, t, u, 'Voltage, V', results['pyramid_u'])
+        self.set_signal(1, t, i, f'{self.probe_name}, mA',
+                        results['pyramid_i'])
+        ax1.set_ylabel('Voltage, V; Probe Current, mA')
+        ax1.set_title(f'#{self.shot}')
+
+        # all spans of kind as one collection
+        for collection, spans, verts in (
+                (self.spans_te_collection, results['spans_te'],
+                 results['verts_te']),
+                (self.spans_ne_collection, results['spans_ne'],
+                 results['verts_ne'])):
+            collection.set_verts(memo_put(self.span_verts, spans, verts))
+
+        # ax2 - Te, ax3 - ne
+        self.te_line.set_data(res_t, te)
+        self.ne_line.set_data(res_t, ne)
 
     def on_key_press(self, event):
         """ Checks if CTRL button pressed. Used for Current-Voltage Plot """
@@ -508,51 +705,70 @@ class MainWindow(QMainWindow):
 
     def current_voltage_plot_on_ctrl_click(self, event):
         """ Plots Current-Volatage Plot on CTRL+Click on axes """
-        # check if control is pressed
-        if not self.ctrl_is_held:
+        # check if control is pressed and Te is plotted
+        if not self.ctrl_is_held or getattr(self, 'tna', None) is None:
             return
         self.ctrl_is_held = False # release control after success ctrl+click
 
-        idx = self.tna.find_nearest_info(event.xdata)
+        if event.xdata is None or len(self.span_times) == 0:
+            return
+        # nearest Te span by binary search
+        idx = self.span_idx[nearest_index(self.span_times, event.xdata)]
         try:
-            fig_detail, ax_detail = plt.subplots()
-            # Set the window title
-
-            u_range = (self.u_min.value(), self.u_max.value())
-            # u_wide, i_wide, u, i, k, c, time_mean
-            u_wide, i_wide, u, i, k, c, t = self.tna.cv_plot_data[idx]
-            # Convert lists to NumPy arrays
-            u_wide = np.array(u_wide)
-            i_wide = np.array(i_wide)
-            u = np.array(u)
-            i = np.array(i)
-            # remove negative values from arrays to put I in log function
-            u_wide, i_wide = remove_negatives(u_wide, i_wide)
-            u, i = remove_negatives(u, i)
-
-            ax_detail.plot(u_wide, np.log(i_wide), 'o', alpha=0.2)
-            ax_detail.plot(u, np.log(i), 'o', ms=5)
-            ax_detail.plot(u, u*k + c)
-
-            ax_detail.set_xlabel('U, В')
-            ax_detail.set_ylabel('ln(I), мА')
-
+            fig_detail, ax_detail, lines = self.get_cv_window()
+            # u_wide, ln(i_wide), u, ln(i), k, c, time_mean
+            u_wide, ln_i_wide, u, ln_i, k, c, t = self.get_cv_detail(idx)
+            lines[0].set_data(u_wide, ln_i_wide)
+            lines[1].set_data(u, ln_i)
+            lines[2].set_data(u, u*k + c)
+            ax_detail.relim()
+            ax_detail.autoscale_view()
+
+            u_range = self.cv_u_range
             p_title = f't = {int(t)} мс   Te = {int(1/k)} эВ  u = {u_range} В'
             ax_detail.set_title(p_title)
             shot = self.signals['shot']
+            # Set the window title
             w_title = f'#{shot} ВАХ {int(t)} мс'
             fig_detail.canvas.manager.set_window_title(w_title)
-            ax_detail.grid(True)
-            plt.show()
+            fig_detail.canvas.draw_idle()
+            fig_detail.show()
         except Exception as e:
             print(f'Error: {e}')
 
+    def get_cv_window(self):
+        """ Current-Voltage Plot window, created again only if closed """
+        if (self.cv_window is None
+                or not plt.fignum_exists(self.cv_window[0].number)):
+            fig_detail, ax_detail = plt.subplots()
+            lines = (ax_detail.plot([], [], 'o', alpha=0.2)[0],
+                     ax_detail.plot([], [], 'o', ms=5)[0],
+                     ax_detail.plot([], [])[0])
+            ax_detail.set_xlabel('U, В')
+            ax_detail.set_ylabel('ln(I), мА')
+            ax_detail.grid(True)
+            self.cv_window = (fig_detail, ax_detail, lines)
+        return self.cv_window
+
+    def get_cv_detail(self, idx):
+        """ Current-Voltage Plot data of window with ln(I), prepared once """
+        if idx not in self.cv_details:
+            # u_wide, i_wide, u, i, k, c, time_mean
+            u_wide, i_wide, u, i, k, c, t = self.cv_plot_data[idx]
+            # remove negative values from arrays to put I in log function
+            u_wide, i_wide = remove_negatives(np.asarray(u_wide),
+                                              np.asarray(i_wide))
+            u, i = remove_negatives(np.asarray(u), np.asarray(i))
+            self.cv_details[idx] = (u_wide, np.log(i_wide), u, np.log(i),
+                                    k, c, t)
+        return self.cv_details[idx]
+
     def zoom_out_plot(self):
         """
         Updates plot with dashboard buttons
         and redraws it with auto axes limits
         """
-        self.axes, self.xy_lims = None, None
+        self.autoscale = True
         self.update_plot()
 
     def key_press_event_enter(self, event):
@@ -582,29 +798,40 @@ class MainWindow(QMainWindow):
 
             return t, u, shot, currents, fp_signals
 
+    def get_analyzer(self, t, u, currents, probe_name):
+        """ TeNeAnalyzer of probe, kept while signals are the same """
+        tna = self.analyzers.get(probe_name)
+        if (tna is None or tna.t is not t or tna.u is not u
+                or tna.i is not currents[probe_name]):
+            tna = TeNeAnalyzer(t, u, currents[probe_name])
+            self.analyzers[probe_name] = tna
+        return tna
+
     def save_txt_te_ne(self):
         """ Save Te and ne for current probe as txt """
         if not hasattr(self, 'signals'):
             self.open_configurator()
         else:
-            # get time, u, shot, probe_name, currents, fp_signals (not used)
-            t, u, shot, currents, fp_singals = self.parse_signals_dict()
-
-            # create TeNeAnalyzer instance
-            tna = TeNeAnalyzer(t, u, currents[self.probe_name])
-            # calculate Te, Ne using given parameters
-            res_t, te, ne, info = tna.calc_te_ne(self.parameters)
+            # plotted results of current parameters, analysis is not run
+            # in GUI thread
+            if self.te_ne is None or self.te_ne[0] != self.generation:
+                pop_up_window('Сохранение Te и ne',
+                              'Нет результатов расчёта для заданных '
+                              'параметров, дождитесь окончания расчёта')
+                return
+            _, probe_name, res_t, te, ne = self.te_ne
+            shot = self.shot
 
             data_columns = [res_t, te, ne]
             headers = [
-                f'{self.probe_name}.time [ms]',
-                f'{self.probe_name}.Te [eV]',
-                f'{self.probe_name}.ne [10^18 m^-3]'
+                f'{probe_name}.time [ms]',
+                f'{probe_name}.Te [eV]',
+                f'{probe_name}.ne [10^18 m^-3]'
             ]
 
             # Combine all columns into a 2D array (rows = data points, columns = variables)
             data_to_save = np.column_stack(data_columns)
-            default_file_name = f"{shot}_{self.probe_name}_Te_ne"
+            default_file_name = f"{shot}_{probe_name}_Te_ne"
             save_as_txt(data_to_save, headers, default_file_name)
 
     def save_txt_u_i(self):
@@ -7,6 +7,9 @@ Created on Thu Apr  3 18:35:49 2025
 
 VERSION = '0.1a'
 ICON_PATH = "gui/resources/icon.ico"
+# workers of calc_te_ne, -1 for all CPUs; analysis runs in worker thread,
+# more than 1 worker starts process pool on every refresh and save
+WORKERS = 1
 
 # Содержит tooltips подсказки при наведении мышкой
 TIPS = {
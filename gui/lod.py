@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Ammosov
+
+Level of detail for plotting long signals: min/max envelope decimation
+"""
+
+import numpy as np
+
+LOD_FACTOR = 4 # samples in bin of the next pyramid level
+LOD_BINS_PER_PIXEL = 1 # min/max pairs drawn per screen pixel
+
+
+def _reduce_extrema(y, idx_min, idx_max, factor):
+    """ Indices of min and max of y in groups of factor candidates """
+    n_bins = -(-len(idx_min) // factor)
+    pad = n_bins * factor - len(idx_min)
+    # last candidate repeated does not change extrema of the last group
+    idx_min = np.concatenate((idx_min, np.repeat(idx_min[-1:], pad)))
+    idx_max = np.concatenate((idx_max, np.repeat(idx_max[-1:], pad)))
+    idx_min = idx_min.reshape(n_bins, factor)
+    idx_max = idx_max.reshape(n_bins, factor)
+    rows = np.arange(n_bins)
+    return (idx_min[rows, np.argmin(y[idx_min], axis=1)],
+            idx_max[rows, np.argmax(y[idx_max], axis=1)])
+
+
+class MinMaxPyramid():
+    """
+    Multi-resolution min/max envelope of signal.
+
+    Level k keeps indices of min and max of every bin of LOD_FACTOR**k
+    samples, so decimated signal keeps all peaks of the original one.
+
+    Parameters
+    ----------
+    t : ndarray
+        1D array of monotonic time values.
+    y : ndarray
+        1D array of signal values.
+
+    Example:
+        pyramid = MinMaxPyramid(t, u)
+        t_plot, u_plot = pyramid.decimate(*ax.get_xlim(), n_bins=1000)
+    """
+    def __init__(self, t, y, factor=LOD_FACTOR):
+        self.t, self.y, self.factor = t, y, factor
+        # interleaved (time ordered) min/max indices of levels 1, 2, ...
+        self.levels = []
+        idx_min = idx_max = np.arange(len(y))
+        while len(idx_min) > factor:
+            idx_min, idx_max = _reduce_extrema(y, idx_min, idx_max, factor)
+            self.levels.append(
+                np.sort(np.column_stack((idx_min, idx_max)), axis=1).ravel())
+
+    def decimate(self, x0, x1, n_bins):
+        """
+        Signal within time range (x0, x1) with at most ~n_bins min/max pairs.
+
+        Returns the original samples if they are fewer than 2*n_bins.
+
+        Returns
+        -------
+        (t, y) : tuple(ndarray, ndarray)
+            Decimated time and signal, including one sample beyond range.
+        """
+        i0 = max(np.searchsorted(self.t, x0, side='left') - 1, 0)
+        i1 = min(np.searchsorted(self.t, x1, side='right') + 1, len(self.t))
+        n_bins = max(int(n_bins), 1)
+        if i1 - i0 <= 2 * n_bins or not self.levels:
+            return self.t[i0:i1], self.y[i0:i1]
+
+        # coarsest level with enough bins within range
+        level = 0
+        bin_size = self.factor
+        while (level + 1 < len(self.levels)
+               and (i1 - i0) / (bin_size * self.factor) >= n_bins):
+            level += 1
+            bin_size *= self.factor
+        b0, b1 = i0 // bin_size, -(-i1 // bin_size)
+        idx = self.levels[level][2 * b0:2 * b1]
+        return self.t[idx], self.y[idx]
+
+
+class LodLine():
+    """
+    Line of axes drawn with decimation by MinMaxPyramid, update is called
+    on axes xlim change (re-decimation on zoom and pan).
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes to plot.
+    pyramid : MinMaxPyramid
+        Envelope of signal.
+    *args, **kwargs
+        Passed to ax.plot.
+    """
+    def __init__(self, ax, pyramid, *args, **kwargs):
+        self.ax, self.pyramid = ax, pyramid
+        t = pyramid.t
+        x0, x1 = (t[0], t[-1]) if len(t) else (0, 1)
+        self.line, = ax.plot(*pyramid.decimate(x0, x1, self.n_bins()),
+                             *args, **kwargs)
+
+    def set_pyramid(self, pyramid):
+        """ Replaces plotted signal keeping line artist """
+        self.pyramid = pyramid
+        self.update()
+
+    def n_bins(self):
+        """ Amount of min/max pairs for axes width """
+        return LOD_BINS_PER_PIXEL * max(int(self.ax.bbox.width), 1)
+
+    def update(self, ax=None):
+        """ Re-decimates line for current xlim (xlim_changed callback) """
+        # pylint: disable=unused-argument
+        self.line.set_data(*self.pyramid.decimate(*self.ax.get_xlim(),
+                                                  self.n_bins()))
@@ -9,6 +9,7 @@ Utils functions to create windows and similar elements
 
 import numpy as np
 import scipy.interpolate as interpolate
+from matplotlib.collections import PolyCollection
 from pathlib import Path
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QIcon
@@ -56,6 +57,61 @@ def align_signals(time1, signal, time2):
                                          fill_value=0)
     return interpolator(time2)
 
+def span_verts(t, spans):
+    """
+    Vertices of rectangles of spans over full axes height.
+
+    Parameters:
+
+    t : array-like
+        Time points.
+    spans : array-like
+        (N, 2) array of start and end indices of spans.
+
+    Returns : ndarray
+        (N, 4, 2) vertices in (time, axes fraction) coordinates.
+    """
+    spans = np.clip(np.asarray(spans, dtype=np.int64).reshape(-1, 2),
+                    0, max(len(t) - 1, 0))
+    x0, x1 = np.asarray(t)[spans[:, 0]], np.asarray(t)[spans[:, 1]]
+    y0, y1 = np.zeros(len(spans)), np.ones(len(spans))
+    return np.stack((np.column_stack((x0, y0)), np.column_stack((x0, y1)),
+                     np.column_stack((x1, y1)), np.column_stack((x1, y0))),
+                    axis=1)
+
+def add_span_collection(ax, verts, **kwargs):
+    """
+    Adds all spans to axes as one PolyCollection (same as axvspan of every
+    span), kwargs are passed to PolyCollection.
+
+    Returns : PolyCollection
+    """
+    collection = PolyCollection(verts, transform=ax.get_xaxis_transform(),
+                                **kwargs)
+    ax.add_collection(collection, autolim=False)
+    return collection
+
+def memo_get(memo, obj, make):
+    """
+    Value of obj from memo {id(obj): (obj, value)} or new value of make(),
+    memo is not changed (see memo_put).
+    """
+    entry = memo.get(id(obj))
+    if entry is not None and entry[0] is obj:
+        return entry[1]
+    return make()
+
+def memo_put(memo, obj, value, size=8):
+    """
+    Saves value of obj in memo, the oldest value is dropped if memo has
+    size values. Returns value.
+    """
+    if id(obj) not in memo and len(memo) >= size:
+        memo.pop(next(iter(memo)))
+    # obj is kept, so its id is not reused
+    memo[id(obj)] = (obj, value)
+    return value
+
 def save_as_txt(data, headers, default_file_name=""):
     """
     Saves data into columns with headers as txt
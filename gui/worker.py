@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Ammosov
+
+Background worker for analysis, so GUI thread is not blocked by calculation
+"""
+
+import traceback
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class AnalysisCancelled(Exception):
+    """ Raised in worker thread when its job is superseded by newer one """
+
+
+class WorkerSignals(QObject):
+    """
+    Signals of AnalysisWorker, all of them contain job generation, so one
+    WorkerSignals object (owned by GUI) is shared by all jobs.
+
+    progress : (generation, done, total)
+    finished : (generation, result)
+    error : (generation, traceback text)
+    """
+    progress = pyqtSignal(int, int, int)
+    finished = pyqtSignal(int, object)
+    error = pyqtSignal(int, str)
+
+
+class AnalysisWorker(QRunnable):
+    """
+    Runs func(*args, progress=callback, **kwargs) in QThreadPool thread.
+
+    Job is stale when is_current(generation) returns False: stale job is not
+    started and running stale job is cancelled in the next progress
+    callback (func must call it regularly), its result is never sent.
+    Progress is sent only when its percentage changes.
+
+    Parameters
+    ----------
+    signals : WorkerSignals
+        Signals to send progress and result to GUI thread.
+    generation : int
+        Job number, newer jobs have greater numbers.
+    is_current : callable
+        is_current(generation) -> bool, called from worker thread.
+    func : callable
+        Calculation, must accept progress keyword argument.
+
+    Example:
+        self.signals = WorkerSignals(self)
+        self.signals.finished.connect(self.on_finished)
+        worker = AnalysisWorker(self.signals, gen,
+                                lambda g: g == self.generation,
+                                tna.calc_te_ne, parameters)
+        QThreadPool.globalInstance().start(worker)
+    """
+    def __init__(self, signals, generation, is_current, func, *args,
+                 **kwargs):
+        super().__init__()
+        self.signals = signals
+        self.generation, self.is_current = generation, is_current
+        self.func, self.args, self.kwargs = func, args, kwargs
+        self.percent = None # last sent percentage of progress
+
+    def progress(self, done, total):
+        """ Progress callback for func, cancels stale job """
+        if not self.is_current(self.generation):
+            raise AnalysisCancelled()
+        # one signal per percent, not per window
+        percent = 100 * done // max(total, 1)
+        if percent != self.percent:
+            self.percent = percent
+            self.signals.progress.emit(self.generation, done, total)
+
+    def run(self):
+        """ Calculates in worker thread and sends result to GUI thread """
+        if not self.is_current(self.generation):
+            return
+        try:
+            result = self.func(*self.args, progress=self.progress,
+                               **self.kwargs)
+        except AnalysisCancelled:
+            return
+        except Exception:
+            self.signals.error.emit(self.generation, traceback.format_exc())
+            return
+        if self.is_current(self.generation):
+            self.signals.finished.emit(self.generation, result)
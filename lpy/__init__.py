@@ -4,8 +4,14 @@
 
 lpy package init file
 """
-from .load import load, extract_shot_number
-from .models import SpanDetector, TeNeAnalyzer, PROBE_AREA_DEFAULT, M_I_DEFAULT
-from .processing import (exp, smooth, remove_nans, remove_zeros,
+from .load import (load, load_text, load_many, find_shot_files,
+                   extract_shot_number)
+from .cache import ShotCache
+from .batch import run_batch
+from .models import (SpanDetector, ChunkedSpanDetector, TeNeAnalyzer,
+                     TeNeResults, CVPlotData, MultiProbeAnalyzer,
+                     PROBE_AREA_DEFAULT, M_I_DEFAULT)
+from .processing import (exp, smooth, smooth_range, remove_nans, remove_zeros,
                          remove_peaks_iqr, remove_negatives,
-                         remove_peaks_by_threshold, is_valid_positive)
+                         remove_peaks_by_threshold, is_valid_positive,
+                         nearest_index)
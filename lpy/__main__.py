@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+Command line entry point: python -m lpy batch ...
+
+@author: Ammosov
+"""
+import sys
+from .batch import main
+
+sys.exit(main())
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Module contains headless batch processing of Te and ne for many shots.
+
+Usage:
+    python -m lpy batch config.yml "C:/data/T15MD_30*.tdms" --probes LP.09
+        --params params.yml --out results --workers 8
+
+Author: Ammosov
+"""
+
+import sys
+import time
+import argparse
+import traceback
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import yaml
+import numpy as np
+from .load import load, find_shot_files, extract_shot_number
+from .models import MultiProbeAnalyzer
+
+# %% constants
+# signals dict keys which are not probe currents
+EXCLUDE_KEYS = ('time', 'LP.Power', 'shot')
+# %% funcs
+
+def probe_names(signals: dict) -> list:
+    """ Returns probe current names from signals dict (no .FP probes) """
+    return [key for key in signals
+            if key not in EXCLUDE_KEYS and not key.endswith('.FP')]
+
+
+def save_te_ne(file_path, probe_name, res_t, te, ne):
+    """ Saves Te and ne of a probe as txt in the dashboard format """
+    headers = [
+        f'{probe_name}.time [ms]',
+        f'{probe_name}.Te [eV]',
+        f'{probe_name}.ne [10^18 m^-3]'
+    ]
+    np.savetxt(file_path, np.column_stack([res_t, te, ne]),
+               header='\t'.join(headers), fmt='%.3f', delimiter='\t')
+
+
+def process_shot(input_path, signals_cfg: dict, probes=None, parameters=None,
+                 out_dir='.', t_range=None, workers=1) -> dict:
+    """
+    Calculates Te and ne for probes of one shot and saves them as txt.
+
+    Probes are processed by MultiProbeAnalyzer with given workers.
+
+    Exceptions are caught, so one broken shot does not stop a batch run.
+
+    Returns
+    -------
+    dict
+        Summary with keys: path, shot, probes, files, elapsed, error.
+    """
+    start = time.perf_counter()
+    summary = {'path': str(input_path),
+               'shot': extract_shot_number(str(input_path)),
+               'probes': [], 'files': [], 'elapsed': 0.0, 'error': None}
+    try:
+        cfg = {'tdms_path': str(input_path), 'signals': signals_cfg}
+        signals = load(None, cfg, t_range=t_range)
+        shot = signals['shot']
+        probes = probes or probe_names(signals)
+        mpa = MultiProbeAnalyzer(signals['time'], signals['LP.Power'],
+                                 {name: signals[name] for name in probes})
+        results = mpa.calc_te_ne(dict(parameters or {}), workers=workers)
+
+        for probe_name, (res_t, te, ne, _) in results.items():
+            file_path = Path(out_dir) / f"{shot}_{probe_name}_Te_ne.txt"
+            save_te_ne(file_path, probe_name, res_t, te, ne)
+            summary['probes'].append(probe_name)
+            summary['files'].append(str(file_path))
+    except Exception:
+        summary['error'] = traceback.format_exc()
+    summary['elapsed'] = time.perf_counter() - start
+    return summary
+
+
+def run_batch(paths, signals_cfg: dict, probes=None, parameters=None,
+              out_dir='.', workers=None, t_range=None, log=print) -> list:
+    """
+    Calculates Te and ne for many shots in parallel worker processes.
+
+    A single shot is processed in current process, its probes (or windows)
+    are processed by workers instead (see MultiProbeAnalyzer.calc_te_ne).
+
+    Parameters
+    ----------
+    paths : str, Path or list
+        Directory with T15MD_*.tdms files, glob pattern or list of paths.
+    signals_cfg : dict
+        Signals mapping, same as cfg['signals'] of load function.
+    probes : list, optional
+        Probe names to process. The default is None (all probe currents).
+    parameters : dict, optional
+        TeNeAnalyzer.calc_te_ne parameters. The default is None (defaults).
+    out_dir : str or Path, optional
+        Output directory for txt files. The default is '.'.
+    workers : int, optional
+        Number of workers. The default is None (CPU count).
+    t_range : tuple(float, float), optional
+        Time window (t0, t1) in [ms] to load. The default is None.
+    log : callable, optional
+        Progress output function. The default is print.
+
+    Returns
+    -------
+    list
+        Summary dict of every shot (see process_shot) in completion order.
+    """
+    input_paths = []
+    for path in ([paths] if isinstance(paths, (str, Path)) else paths):
+        # unmatched path is kept to be reported as failed shot
+        input_paths.extend(find_shot_files(path) or [str(path)])
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+    def log_summary(n, summary):
+        status = 'OK' if summary['error'] is None else 'ERROR'
+        log(f"[{n}/{len(input_paths)}] #{summary['shot']} {status} "
+            f"{summary['elapsed']:.2f} s {', '.join(summary['probes'])}")
+        if summary['error'] is not None:
+            log(summary['error'])
+
+    if len(input_paths) == 1:
+        summary = process_shot(input_paths[0], signals_cfg, probes,
+                               parameters, out_dir, t_range,
+                               workers=-1 if workers is None else workers)
+        log_summary(1, summary)
+        return [summary]
+
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_shot, input_path, signals_cfg,
+                                   probes, parameters, out_dir, t_range)
+                   for input_path in input_paths]
+        for n, future in enumerate(as_completed(futures), start=1):
+            summary = future.result()
+            summaries.append(summary)
+            log_summary(n, summary)
+    return summaries
+
+
+def parse_args(argv=None):
+    """ Parses command line arguments """
+    parser = argparse.ArgumentParser(
+        prog='python -m lpy',
+        description='Langmuir probe data analysis without GUI')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batch = subparsers.add_parser(
+        'batch', help='calculate Te and ne for many shots')
+    batch.add_argument('config',
+                       help='YAML config with signals (as in configurator)')
+    batch.add_argument('shots', nargs='*',
+                       help='shot files, directories or glob patterns '
+                       '(default: tdms_path from config)')
+    batch.add_argument('--probes', nargs='+', default=None,
+                       help='probe names (default: all probe currents)')
+    batch.add_argument('--params', default=None,
+                       help='YAML file with calc_te_ne parameters')
+    batch.add_argument('--out', default='.', help='output directory')
+    batch.add_argument('--workers', type=int, default=None,
+                       help='number of worker processes (threads for '
+                       'probes of a single shot)')
+    batch.add_argument('--t-range', nargs=2, type=float, default=None,
+                       metavar=('T0', 'T1'), help='time window in [ms]')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """ Command line entry point, returns exit code """
+    args = parse_args(argv)
+
+    with open(args.config, encoding='utf-8') as stream:
+        cfg = yaml.safe_load(stream)
+    parameters = {}
+    if args.params is not None:
+        with open(args.params, encoding='utf-8') as stream:
+            parameters = yaml.safe_load(stream) or {}
+
+    shots = args.shots or [cfg['tdms_path']]
+    start = time.perf_counter()
+    summaries = run_batch(shots, cfg['signals'], probes=args.probes,
+                          parameters=parameters, out_dir=args.out,
+                          workers=args.workers, t_range=args.t_range)
+    failed = [summary for summary in summaries if summary['error']]
+    print(f"Done: {len(summaries) - len(failed)} OK, {len(failed)} failed, "
+          f"{time.perf_counter() - start:.2f} s")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Module contains on-disk cache of loaded (already factored) signals.
+
+Each cache entry is a directory with one .npy file per signal and meta.yml
+file. Entries are opened with np.load(mmap_mode='r'), so repeated loads of
+the same shot are near zero-copy. Least recently used entries are evicted
+when total cache size exceeds the limit.
+
+Author: Ammosov
+"""
+
+import os
+import time
+import json
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+import yaml
+import numpy as np
+
+# %% constants
+CACHE_DIR_DEFAULT = Path.home() / '.cache' / 'lpy'
+CACHE_SIZE_DEFAULT = 2 * 1024**3  # max cache size in bytes (2 GB)
+META_FILE = 'meta.yml'
+# %%
+
+class ShotCache():
+    """
+    Persistent cache of loaded shots stored as memory-mapped .npy files.
+
+    Parameters
+    ----------
+    path : str or Path, optional
+        Cache directory. The default is CACHE_DIR_DEFAULT.
+    max_size : int, optional
+        Cache size limit in bytes. The default is CACHE_SIZE_DEFAULT.
+
+    Example:
+        cache = ShotCache()
+        signals = load("3008.yml", cache=cache)  # parses TDMS, fills cache
+        signals = load("3008.yml", cache=cache)  # memory-mapped from cache
+        cache.clear()
+    """
+
+    def __init__(self, path=None, max_size=CACHE_SIZE_DEFAULT):
+        self.path = Path(path) if path is not None else CACHE_DIR_DEFAULT
+        self.max_size = max_size
+
+    def key(self, input_path, signals_cfg, t_range=None):
+        """
+        Creates cache key for a file and its signals config.
+
+        Key depends on file path, modification time and size, so changed
+        files are not taken from cache, and on channel/factor config.
+        """
+        input_path = Path(input_path).resolve()
+        stat = input_path.stat()
+        key_data = {
+            'path': str(input_path),
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'signals': signals_cfg,
+            't_range': None if t_range is None else list(t_range),
+        }
+        key_str = json.dumps(key_data, sort_keys=True, default=str)
+        return hashlib.sha1(key_str.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """ Returns memory-mapped signals dict or None if key is missing """
+        entry = self.path / key
+        meta_path = entry / META_FILE
+        if not meta_path.exists():
+            return None
+
+        with open(meta_path, encoding='utf-8') as stream:
+            meta = yaml.safe_load(stream)
+
+        signals = dict(meta['scalars'])
+        for signame, file_name in meta['arrays'].items():
+            signals[signame] = np.load(entry / file_name, mmap_mode='r')
+
+        self._touch(entry)
+        return signals
+
+    def put(self, key, signals):
+        """ Stores signals dict in cache and evicts old entries if needed """
+        self.path.mkdir(parents=True, exist_ok=True)
+        entry = self.path / key
+
+        # write to temporary dir first, so readers never see partial entry
+        tmp_entry = Path(tempfile.mkdtemp(dir=self.path, prefix='.tmp_'))
+        meta = {'scalars': {}, 'arrays': {}}
+        for n, (signame, value) in enumerate(signals.items()):
+            if isinstance(value, np.ndarray):
+                file_name = f'{n}.npy'
+                np.save(tmp_entry / file_name, value)
+                meta['arrays'][signame] = file_name
+            else:
+                meta['scalars'][signame] = value
+        with open(tmp_entry / META_FILE, 'w', encoding='utf-8') as stream:
+            yaml.safe_dump(meta, stream, allow_unicode=True)
+
+        # entry without meta file is partially deleted, it is replaced
+        if entry.exists() and not (entry / META_FILE).exists():
+            shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.replace(tmp_entry, entry)
+        except OSError:
+            # entry was stored concurrently by another process
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        if (entry / META_FILE).exists():
+            self._touch(entry)
+        self.evict(keep=key)
+
+    def _touch(self, entry):
+        """ Marks entry as recently used (meta file mtime is LRU order) """
+        now = time.time_ns()
+        os.utime(entry / META_FILE, ns=(now, now))
+
+    def entries(self):
+        """
+        Returns list of (last_used, size, entry_path) of cache entries.
+
+        Entries without meta file (partially deleted) are orphaned, they
+        are counted as least recently used (last_used is 0).
+        """
+        if not self.path.exists():
+            return []
+
+        entries = []
+        for entry in self.path.iterdir():
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            meta_path = entry / META_FILE
+            last_used = (meta_path.stat().st_mtime_ns
+                         if meta_path.exists() else 0)
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((last_used, size, entry))
+        return entries
+
+    def size(self):
+        """ Returns total cache size in bytes """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """
+        Removes orphaned entries and least recently used entries until
+        size fits max_size.
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry[0])
+        total = sum(size for _, size, _ in entries)
+        for last_used, size, entry in entries:
+            if total <= self.max_size and last_used > 0:
+                break
+            if entry.name == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """ Removes all cache entries """
+        if self.path.exists():
+            shutil.rmtree(self.path, ignore_errors=True)
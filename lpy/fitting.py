@@ -0,0 +1,487 @@
+"""
+Module contains vectorised functions for sliding windows of spans: window
+assembly by indices, window sums and fitting of many windows at once
+
+Author: Ammosov
+"""
+
+import numpy as np
+from .parallel import map_ordered, resolve_workers
+
+
+def _span_bounds(spans, length):
+    """ Returns span starts and ends clipped as by slicing (end >= start) """
+    spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+    starts = np.clip(spans[:, 0], 0, length)
+    ends = np.clip(spans[:, 1], starts, length)
+    return starts, ends
+
+
+def span_offsets(spans, length):
+    """
+    Offsets of spans in concatenated samples of all spans.
+
+    Parameters
+    ----------
+    spans : ndarray
+        (N, 2) array of (start, end) indices, end is not included.
+    length : int
+        Length of signal, spans are clipped to it as by slicing.
+
+    Returns
+    -------
+    ndarray
+        Array of N + 1 offsets, samples of span n are
+        offsets[n]:offsets[n+1] and samples of window of n_avg spans
+        starting with span n are offsets[n]:offsets[n+n_avg].
+    """
+    starts, ends = _span_bounds(spans, length)
+    offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+    np.cumsum(ends - starts, out=offsets[1:])
+    return offsets
+
+
+def span_indices(spans, length):
+    """
+    Signal indices of all spans concatenated and their offsets.
+
+    Signal is gathered once by these indices (e.g. u[indices]), then every
+    sliding window of spans is a contiguous slice of gathered samples, so
+    overlapping windows share memory instead of being concatenated again.
+
+    Parameters
+    ----------
+    spans : ndarray
+        (N, 2) array of (start, end) indices, end is not included.
+    length : int
+        Length of signal, spans are clipped to it as by slicing.
+
+    Returns
+    -------
+    (indices, offsets) : tuple(ndarray, ndarray)
+        Concatenated indices of all spans and offsets (see span_offsets).
+
+    Example:
+        indices, offsets = span_indices(spans, len(u))
+        u_spans = u[indices]
+        u_window = u_spans[offsets[n]:offsets[n + n_avg]]
+    """
+    starts, _ = _span_bounds(spans, length)
+    offsets = span_offsets(spans, length)
+    lengths = np.diff(offsets)
+    # index of sample is its position in output shifted to span start
+    indices = np.arange(offsets[-1], dtype=np.int64)
+    indices += np.repeat(starts - offsets[:-1], lengths)
+    return indices, offsets
+
+
+def span_sums(values, spans):
+    """
+    Sums of values over every span (np.add.reduceat), zero for empty spans.
+
+    Parameters
+    ----------
+    values : array like
+        1D array of values (e.g. signal samples).
+    spans : ndarray
+        (N, 2) array of (start, end) indices, end is not included.
+
+    Returns
+    -------
+    ndarray
+        Array of N span sums.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    starts, ends = _span_bounds(spans, len(values))
+    sums = np.zeros(len(starts))
+    not_empty = ends > starts
+    if np.any(not_empty):
+        # trailing zero allows end index equal to len(values)
+        padded = np.append(values, 0.0)
+        bounds = np.column_stack((starts, ends))[not_empty].ravel()
+        sums[not_empty] = np.add.reduceat(padded, bounds)[::2]
+    return sums
+
+
+def sliding_sums(sums, n_avg=1):
+    """ Sums of n_avg consecutive values (e.g. span sums) by prefix sums """
+    if len(sums) < n_avg:
+        return np.zeros(0)
+    csum = np.zeros(len(sums) + 1)
+    np.cumsum(sums, out=csum[1:])
+    return csum[n_avg:] - csum[:-n_avg]
+
+
+def window_sums(values, spans, n_avg=1):
+    """
+    Sums of values over sliding windows of n_avg consecutive spans.
+
+    Every span is summed once (np.add.reduceat), then window sums are found
+    from prefix sums over span sums, so overlapping windows reuse the work
+    instead of summing samples again.
+
+    Parameters
+    ----------
+    values : array like
+        1D array of values (e.g. signal samples).
+    spans : ndarray
+        (N, 2) array of (start, end) indices, end is not included.
+        Spans with end <= start are empty.
+    n_avg : int, optional
+        Amount of spans in a window. The default is 1.
+
+    Returns
+    -------
+    ndarray
+        Array of N - n_avg + 1 window sums.
+    """
+    return sliding_sums(span_sums(values, spans), n_avg)
+
+
+def linear_fit_sums(n, sx, sy, sxx, sxy, syy, x0=0.0, y0=0.0):
+    """
+    Least squares fit y = k*x + c of many windows from their sums.
+
+    Same formulas as scipy.stats.linregress: slope, intercept and their
+    standard errors. Values are NaN for windows with less than 2 points or
+    identical x values.
+
+    Parameters
+    ----------
+    n : array like
+        Amount of points in every window.
+    sx, sy, sxx, sxy, syy : array like
+        Sums of x, y, x*x, x*y, y*y in every window.
+    x0, y0 : float, optional
+        Shifts subtracted from x and y before summing (e.g. global means
+        to avoid loss of precision). The default is 0.0.
+
+    Returns
+    -------
+    (k, c, kerr, cerr) : tuple(ndarray, ...)
+        slope, intercept, slope stderr, intercept stderr.
+    """
+    n = np.asarray(n, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xmean, ymean = sx / n, sy / n
+        # biased (co)variances as np.cov(x, y, bias=1)
+        ssxm = np.maximum(sxx / n - xmean * xmean, 0.0)
+        ssym = np.maximum(syy / n - ymean * ymean, 0.0)
+        ssxym = sxy / n - xmean * ymean
+
+        r_den = np.sqrt(ssxm * ssym)
+        r = np.where(r_den == 0.0, 0.0, ssxym / r_den)
+        r = np.clip(r, -1.0, 1.0)
+
+        k = ssxym / ssxm
+        c = ymean + y0 - k * (xmean + x0)
+        kerr = np.sqrt((1 - r**2) * ssym / ssxm / (n - 2))
+        # stderr of line through 2 points is zero
+        kerr = np.where(n == 2, 0.0, kerr)
+        cerr = kerr * np.sqrt(ssxm + (xmean + x0)**2)
+
+        # identical x values (variance is zero up to rounding)
+        undefined = (n < 2) | ~(ssxm > 1e-12 * sxx / n)
+    for res in (k, c, kerr, cerr):
+        res[undefined] = np.nan
+    return k, c, kerr, cerr
+
+
+# %% exponential fit
+# fit status of window
+FIT_FAILED = -1 # not enough points, non finite values or k not determined
+FIT_MAX_ITER = 0 # iteration budget is exhausted or not a minimum
+FIT_CONVERGED = 1
+# relative decrease of squares sum along a parameter allowed by bounds at
+# minimum (Gauss-Newton estimate)
+FIT_GRADIENT_TOL = 1e-4
+# max amount of samples of all windows fitted at once
+FIT_BATCH_SAMPLES = 1 << 22
+# least amount of batches of fit if progress is reported
+FIT_PROGRESS_STEPS = 20
+
+
+def _segment_sums(values, offsets):
+    """ Sums of values[offsets[n]:offsets[n+1]], len(values) == offsets[-1] """
+    sums = np.zeros(len(offsets) - 1)
+    not_empty = np.diff(offsets) > 0
+    if np.any(not_empty):
+        sums[not_empty] = np.add.reduceat(values, offsets[:-1][not_empty])
+    return sums
+
+
+def _exp_residuals(x, y, lengths, k, c):
+    """ Exponent values, residuals and squares sums of windows """
+    with np.errstate(over='ignore', invalid='ignore'):
+        f = np.exp(np.repeat(k, lengths) * x + np.repeat(c, lengths))
+        r = y - f
+        ssr = _segment_sums(r * r, np.concatenate(([0], np.cumsum(lengths))))
+    return f, r, ssr
+
+
+def _exp_normal_sums(x, f, offsets):
+    """ Sums of J^T J of exponent, J = (x*f, f), for every window """
+    with np.errstate(over='ignore', invalid='ignore'):
+        xf = x * f
+        return (_segment_sums(xf * xf, offsets),
+                _segment_sums(xf * f, offsets), _segment_sums(f * f, offsets))
+
+
+def _projected_decrease(p, g, a, ssr, bounds):
+    """
+    Relative decrease g^2/(a*ssr) of squares sum along parameter p with
+    descent direction g, zero if p is at bound and g points out of bounds.
+    """
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        decrease = np.nan_to_num(g * g / (a * ssr))
+    blocked = ((p <= bounds[0]) & (g <= 0)) | ((p >= bounds[1]) & (g >= 0))
+    return np.where(blocked, 0.0, decrease)
+
+
+def _bounded_step(g1, g2, a11, a12, a22, delta_k, delta_c, v_k, v_c):
+    """
+    Step d = delta + t*v minimizing quadratic model -g.d + d.A.d/2.
+
+    Used when a parameter is fixed at bound: delta moves it to bound and
+    v is direction along which the other parameter changes.
+    """
+    av_k = a11 * v_k + a12 * v_c
+    av_c = a12 * v_k + a22 * v_c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = ((g1 * v_k + g2 * v_c - delta_k * av_k - delta_c * av_c)
+             / (v_k * av_k + v_c * av_c))
+    t = np.nan_to_num(t)
+    return delta_k + t * v_k, delta_c + t * v_c
+
+
+def _exp_fit_batch(x, y, lengths, k, c, bounds, max_iter, tol):
+    """
+    Damped Newton fit of y = exp(k*x + c) for windows of one batch.
+
+    x, y are samples of all windows concatenated, lengths are amounts of
+    samples of windows. Every window has its own damping and stops
+    iterating when converged, so results do not depend on other windows.
+    x is centered by window means while iterating, which decorrelates
+    k and c (exp(k*(x - x_mean) + c_c), c = c_c - k*x_mean).
+
+    Converged window is checked to be a minimum within bounds (projected
+    gradient is small), otherwise its status is FIT_MAX_ITER. Window with
+    standard error of k larger than bounds range is failed: exponent is
+    negligible for its samples (e.g. ion current only), so k is not
+    determined. Iterations start at seed and only decrease squares sum, so
+    result never fits worse than seed.
+    """
+    n_win = len(lengths)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = np.nan_to_num(_segment_sums(x, offsets) / lengths)
+    x_c = x - np.repeat(x_mean, lengths)
+
+    k, c = np.clip(k, *bounds), np.clip(c, *bounds)
+    c_c = c + k * x_mean
+    lam = np.full(n_win, 1e-3)
+    status = np.full(n_win, FIT_MAX_ITER)
+    status[lengths < 2] = FIT_FAILED
+
+    f, r, ssr = _exp_residuals(x_c, y, lengths, k, c_c)
+    status[~np.isfinite(ssr)] = FIT_FAILED
+
+    # windows still iterating and their samples
+    active = np.nonzero(status == FIT_MAX_ITER)[0]
+    sample_mask = np.repeat(status == FIT_MAX_ITER, lengths)
+    x_a, y_a, f_a, r_a = (arr[sample_mask] for arr in (x_c, y, f, r))
+    for _ in range(max_iter):
+        if len(active) == 0:
+            break
+        lengths_a = lengths[active]
+        offsets_a = np.concatenate(([0], np.cumsum(lengths_a)))
+
+        # Newton step with Levenberg-Marquardt damping:
+        # (H + lam*diag(J^T J)) d = J^T r, residuals are large (noisy data),
+        # so full Hessian H = sum(f*(2f - y) * (x^2, x; x, 1)) is used near
+        # minimum, far from it (H is not positive definite) H = J^T J
+        a11, a12, a22 = _exp_normal_sums(x_a, f_a, offsets_a)
+        # overflowing sums (exponent at bounds) give rejected step
+        with np.errstate(over='ignore', invalid='ignore'):
+            w = f_a * (2 * f_a - y_a)
+            h11 = _segment_sums(w * x_a * x_a, offsets_a)
+            h12 = _segment_sums(w * x_a, offsets_a)
+            h22 = _segment_sums(w, offsets_a)
+            not_pd = (h11 <= 0) | (h11 * h22 - h12 * h12 <= 0)
+            g1 = _segment_sums(x_a * f_a * r_a, offsets_a)
+            g2 = _segment_sums(f_a * r_a, offsets_a)
+        h11, h12, h22 = (np.where(not_pd, a, h)
+                         for a, h in ((a11, h11), (a12, h12), (a22, h22)))
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            d11 = h11 + lam[active] * a11
+            d22 = h22 + lam[active] * a22
+            det = d11 * d22 - h12 * h12
+            dk = np.nan_to_num((d22 * g1 - h12 * g2) / det)
+            dc = np.nan_to_num((d11 * g2 - h12 * g1) / det)
+        # singular matrix gives no step, step is rejected
+        not_descent = (det <= 0) | (d11 <= 0)
+        dk[not_descent], dc[not_descent] = 0.0, 0.0
+
+        # parameter out of bounds is fixed at bound and step is solved
+        # along the bound (k fixed: direction (0, 1); c fixed: (1, x_mean))
+        k_old, c_c_old = k[active], c_c[active]
+        c_old = c_c_old - k_old * x_mean[active]
+        matrix = (g1, g2, d11, h12, d22)
+        k_bound = np.clip(k_old + dk, *bounds)
+        out_k = k_bound != k_old + dk
+        dk_k, dc_k = _bounded_step(*matrix, k_bound - k_old, 0.0, 0.0, 1.0)
+        dk, dc = np.where(out_k, dk_k, dk), np.where(out_k, dc_k, dc)
+
+        c_new = c_c_old + dc - (k_old + dk) * x_mean[active]
+        c_bound = np.clip(c_new, *bounds)
+        out_c = c_bound != c_new
+        dk_c, dc_c = _bounded_step(*matrix, 0.0, c_bound - c_old,
+                                   1.0, x_mean[active])
+        dk = np.where(out_c & ~out_k, dk_c, dk)
+        dc = np.where(out_c & ~out_k, dc_c, dc)
+
+        k_new = np.clip(k_old + dk, *bounds)
+        c_new = np.clip(c_c_old + dc - k_new * x_mean[active], *bounds)
+        c_c_new = c_new + k_new * x_mean[active]
+
+        f_new, r_new, ssr_new = _exp_residuals(x_a, y_a, lengths_a,
+                                               k_new, c_c_new)
+        accept = (np.isfinite(ssr_new) & (ssr_new < ssr[active])
+                  & ~not_descent)
+        # relative step of (centered) parameters is small
+        small = ~not_descent & (
+            (np.abs(k_new - k_old) <= tol * (np.abs(k_old) + tol))
+            & (np.abs(c_c_new - c_c_old) <= tol * (np.abs(c_c_old) + tol)))
+        # step is small because of convergence, not because of damping
+        converged = ((accept & small & (lam[active] < 1))
+                     | (lam[active] > 1e10))
+
+        win_accept = active[accept]
+        k[win_accept], c_c[win_accept] = k_new[accept], c_c_new[accept]
+        ssr[win_accept] = ssr_new[accept]
+        lam[active] = np.where(accept, lam[active] / 10, lam[active] * 10)
+        status[active[converged]] = FIT_CONVERGED
+
+        # keep samples of accepted steps and of windows still iterating
+        sample_accept = np.repeat(accept, lengths_a)
+        f_a = np.where(sample_accept, f_new, f_a)
+        r_a = np.where(sample_accept, r_new, r_a)
+        sample_mask = np.repeat(~converged, lengths_a)
+        x_a, y_a, f_a, r_a = (arr[sample_mask]
+                              for arr in (x_a, y_a, f_a, r_a))
+        active = active[~converged]
+
+    c = c_c - k * x_mean
+    f, r, ssr = _exp_residuals(x, y, lengths, k, c)
+    a11, a12, a22 = _exp_normal_sums(x, f, offsets)
+
+    # minimum within bounds: no decrease along parameters allowed by bounds
+    with np.errstate(over='ignore', invalid='ignore'):
+        g1 = _segment_sums(x * f * r, offsets)
+        g2 = _segment_sums(f * r, offsets)
+    not_minimum = ((status == FIT_CONVERGED)
+                   & ((_projected_decrease(k, g1, a11, ssr, bounds)
+                       > FIT_GRADIENT_TOL)
+                      | (_projected_decrease(c, g2, a22, ssr, bounds)
+                         > FIT_GRADIENT_TOL)))
+    status[not_minimum] = FIT_MAX_ITER
+
+    # covariance as in scipy curve_fit: inv(J^T J) * ssr / (n - 2)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        s_sq = np.where(lengths > 2, ssr / (lengths - 2), np.inf)
+        det = a11 * a22 - a12 * a12
+        kerr = np.sqrt(a22 / det * s_sq)
+        cerr = np.sqrt(a11 / det * s_sq)
+    # k is not determined by samples
+    status[~(kerr <= bounds[1] - bounds[0])] = FIT_FAILED
+    return k, c, kerr, cerr, status
+
+
+def exp_fit_windows(x, y, offsets, n_avg=1, k0=1.0, c0=1.0,
+                    bounds=(-10, 10), max_iter=100, tol=1e-8, workers=1,
+                    progress=None):
+    """
+    Least squares fit y = exp(k*x + c) of all sliding windows of spans.
+
+    Same problem as scipy curve_fit for every window, solved for all
+    windows at once by vectorised damped Newton (Levenberg-Marquardt with
+    full Hessian near minimum) with bounded iteration budget. Windows are
+    fitted in batches of at most FIT_BATCH_SAMPLES samples, batches are
+    fitted in threads if workers > 1 (results do not depend on batches).
+
+    Parameters
+    ----------
+    x, y : ndarray
+        Samples of all spans concatenated.
+    offsets : ndarray
+        N + 1 offsets of spans in x and y (see span_offsets).
+    n_avg : int, optional
+        Amount of spans in a window. The default is 1.
+    k0, c0 : float or ndarray, optional
+        Initial parameters of every window (e.g. from log-linear fit).
+        Not finite values are replaced by 1.0. The default is 1.0.
+    bounds : tuple(float, float), optional
+        Lower and upper bounds of k and c. The default is (-10, 10).
+    max_iter : int, optional
+        Iteration budget of every window. The default is 100.
+    tol : float, optional
+        Relative tolerance of parameters steps (as xtol of curve_fit).
+        The default is 1e-8.
+    workers : int, optional
+        Amount of threads (see parallel.resolve_workers). The default is 1.
+    progress : callable, optional
+        progress(done, total) is called with amount of fitted windows after
+        every batch, at least FIT_PROGRESS_STEPS batches are made then. It
+        may raise an exception to stop fitting. The default is None.
+
+    Returns
+    -------
+    (k, c, kerr, cerr, status) : tuple(ndarray, ...)
+        Parameters, their standard errors and fit status (FIT_CONVERGED,
+        FIT_MAX_ITER or FIT_FAILED) of N - n_avg + 1 windows.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n_win = max(len(offsets) - n_avg, 0)
+    starts, ends = offsets[:n_win], offsets[n_avg:n_avg + n_win]
+    lengths = ends - starts
+    k0 = np.broadcast_to(np.asarray(k0, dtype=np.float64), (n_win,))
+    c0 = np.broadcast_to(np.asarray(c0, dtype=np.float64), (n_win,))
+    k0 = np.where(np.isfinite(k0), k0, 1.0)
+    c0 = np.where(np.isfinite(c0), c0, 1.0)
+
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    # at least one batch per worker and FIT_PROGRESS_STEPS for progress
+    batch_samples = FIT_BATCH_SAMPLES
+    n_batches = resolve_workers(workers)
+    if progress is not None:
+        n_batches = max(n_batches, FIT_PROGRESS_STEPS)
+    if n_batches > 1:
+        batch_samples = min(batch_samples,
+                            -(-int(lengths.sum()) // n_batches))
+    batches = []
+    batch_start = 0
+    while batch_start < n_win:
+        # windows of batch, at least one
+        csum = np.cumsum(lengths[batch_start:])
+        batch_end = batch_start + max(
+            np.searchsorted(csum, batch_samples, side='right'), 1)
+        batches.append(slice(batch_start, batch_end))
+        batch_start = batch_end
+
+    def fit_batch(batch):
+        indices, _ = span_indices(np.column_stack((starts[batch],
+                                                   ends[batch])), len(x))
+        return _exp_fit_batch(x[indices], y[indices], lengths[batch],
+                              k0[batch], c0[batch], bounds, max_iter, tol)
+
+    results = [np.zeros(n_win) for _ in range(4)]
+    results.append(np.full(n_win, FIT_FAILED))
+    batch_progress = None
+    if progress is not None:
+        def batch_progress(done, _total):
+            progress(batches[done - 1].stop, n_win)
+    for batch, batch_results in zip(batches, map_ordered(
+            fit_batch, batches, workers, progress=batch_progress)):
+        for res, batch_res in zip(results, batch_results):
+            res[batch] = batch_res
+    return tuple(results)
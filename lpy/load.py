@@ -8,15 +8,33 @@ Module contains function to load
 """
 # %% imports
 import re
+import ast
+import glob
+import operator
+from collections import Counter
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import yaml
 import numpy as np
 from pathlib import Path
 import matplotlib.pyplot as plt
 from scipy.signal import resample
 from nptdms import TdmsFile
+from .cache import ShotCache
 
 # %% constants
 GROUP = 'PXIe-6358'  # group name in tdms files (seems to be constant for now)
+TEXT_CHUNK_SIZE = 1 << 24  # text files are parsed by chunks of 16 MB
+# arithmetic operators allowed in signal factor expressions
+FACTOR_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
 # %% funcs
 
 def extract_shot_number(file_path: str, prefix: str = "T15MD_",
@@ -50,8 +68,92 @@ def extract_shot_number(file_path: str, prefix: str = "T15MD_",
     except ValueError:
         raise ValueError(f"Invalid shot number format: {match.group(1)}")
 
+def _read_text_header(stream) -> list:
+    """ Reads column names from the first line of text file """
+    line = stream.readline().decode('utf-8').strip().lstrip('#').strip()
+    # tab separated headers may contain spaces e.g. "LP.09.time [ms]"
+    if '\t' in line:
+        return [name.strip() for name in line.split('\t')]
+    return line.split()
+
+
+def _read_text_columns(stream, n_cols: int, columns,
+                       chunk_size: int = TEXT_CHUNK_SIZE) -> dict:
+    """
+    Parses whitespace separated numeric text by chunks of bytes.
+
+    Every chunk is cut at the last line break and parsed with C-level
+    np.fromstring, only requested columns of the chunk are kept.
+
+    Parameters
+    ----------
+    stream : binary file object
+        File positioned at the first data line.
+    n_cols : int
+        Number of columns in file.
+    columns : iterable of int
+        Indices of columns to return.
+    chunk_size : int, optional
+        Chunk size in bytes. The default is TEXT_CHUNK_SIZE.
+
+    Returns
+    -------
+    dict
+        column index: np.ndarray of column values.
+    """
+    columns = sorted(set(columns))
+    parts = {col: [] for col in columns}
+    tail, eof = b'', False
+    while not eof:
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        chunk = tail + chunk
+        if not eof:
+            # incomplete last line is parsed with the next chunk
+            cut = chunk.rfind(b'\n') + 1
+            chunk, tail = chunk[:cut], chunk[cut:]
+        if chunk.strip():
+            values = np.fromstring(chunk, sep=' ')
+            if values.size % n_cols:
+                raise ValueError("Неверный формат данных в текстовом файле")
+            values = values.reshape(-1, n_cols)
+            for col in columns:
+                parts[col].append(values[:, col].copy())
+    return {col: np.concatenate(parts[col]) if parts[col] else np.array([])
+            for col in columns}
+
+
+def _find_time_column(headers: list):
+    """ Returns index of time column (e.g. "time", "LP.09.time [ms]") """
+    for n, name in enumerate(headers):
+        if name.split()[0].lower().endswith('time'):
+            return n
+    return None
+
+
 def load_text(cfg_path: str, cfg=None) -> dict:
-    """ Load LP signals using config file but from txt """
+    """
+    Load LP signals using config file but from txt.
+
+    Text file contains header line with column names and whitespace (tab)
+    separated numeric columns, e.g. exported by dashboard "U, I" save.
+    Every signal "channel" in config is a column name. Time is taken from
+    "time" signal in config, from time column (name ends with "time") or
+    created from cfg['rate'] in [Hz].
+
+    Parameters
+    ----------
+    cfg_path : str
+        Path to config file.
+    cfg : dict, optional
+        Config dict used if cfg_path is None. Path to text file is taken
+        from 'path' or 'tdms_path' key.
+
+    Returns
+    -------
+    signals: dict{np.ndarray, ...}
+        Contains np.ndarray signals (same keys as load function).
+    """
     if cfg_path is not None:
         cfg_path = str(Path(cfg_path).resolve())
         # load cfg file
@@ -60,45 +162,192 @@ def load_text(cfg_path: str, cfg=None) -> dict:
     elif cfg is None:
         raise ValueError("Ошибка в конфигурации")
 
-    # get paths from cfg
-    if 'path' not in cfg:
+    # get paths from cfg (configurator stores any file path as tdms_path)
+    path = cfg.get('path', cfg.get('tdms_path'))
+    if path is None:
         raise ValueError("Отсутствует путь к файлу")
-    input_path = str(Path(cfg['path']).resolve())
+    input_path = str(Path(path).resolve())
 
     # create signals dict already factored
     signals = {}
+    signals['shot'] = extract_shot_number(input_path, postfix=".txt")
+
+    with open(input_path, 'rb') as stream:
+        headers = _read_text_header(stream)
+
+        # map signal channels to column indices
+        signal_cols = {}
+        for signame, props in cfg['signals'].items():
+            if props['channel'] not in headers:
+                raise ValueError(f"Отсутствует столбец {props['channel']}")
+            signal_cols[signame] = headers.index(props['channel'])
+        time_col = None
+        if 'time' not in signal_cols:
+            time_col = _find_time_column(headers)
+
+        columns = list(signal_cols.values())
+        if time_col is not None:
+            columns.append(time_col)
+        data = _read_text_columns(stream, len(headers), columns)
+        t_len = len(next(iter(data.values()))) if data else 0
+
+    # how many signals use every column, last one may scale in-place
+    column_uses = Counter(signal_cols.values())
+    if time_col is not None:
+        signals['time'] = data[time_col]
+        column_uses[time_col] += 1
+
+    for signame, col in signal_cols.items():
+        column_uses[col] -= 1
+        column = data[col].copy() if column_uses[col] > 0 else data.pop(col)
+        factor = cfg['signals'][signame]['factor']
+        signals[signame] = _apply_factor(column, 1.0, 0.0, factor)
+
+    # create time track from rate if there is no time column
+    if 'time' not in signals:
+        if 'rate' not in cfg:
+            raise ValueError("Отсутствует столбец времени или частота rate")
+        step = _time_step(cfg['rate'], t_len)
+        signals['time'] = np.linspace(0.0, (t_len - 1) * step,
+                                      num=t_len)  # [ms]
+
+    return signals
+
+def _eval_factor_node(node):
+    """
+    Recursively evaluates arithmetic AST node of factor expression.
 
-    signals['shot'] = extract_shot_number(input_path,  postfix=".txt")
+    Numbers are evaluated as floats, so huge powers raise OverflowError
+    instead of calculating huge integers.
+    """
+    # numbers are ast.Num nodes with value in n before python 3.8
+    value = (node.value if isinstance(node, ast.Constant)
+             else getattr(node, 'n', None))
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(node, ast.BinOp) and type(node.op) in FACTOR_OPERATORS:
+        return FACTOR_OPERATORS[type(node.op)](_eval_factor_node(node.left),
+                                               _eval_factor_node(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in FACTOR_OPERATORS:
+        return FACTOR_OPERATORS[type(node.op)](_eval_factor_node(node.operand))
+    raise ValueError(f"Недопустимое выражение: {ast.dump(node)}")
+
+
+def parse_factor(factor) -> float:
+    """
+    Safely evaluates signal factor from config (e.g. -34 or "1000 / 50").
 
-    # load tdms file LP
-    with open(input_path, 'r', encoding='utf-8') as f:
-        headers = f.readline().strip().split()
-        data = np.loadtxt('file.txt', skiprows=1)
+    Only numbers, parentheses and +, -, *, /, ** operators are allowed.
+    Result is cached, so every expression is parsed once per session.
 
-    for signame, props in cfg['signals'].items():
-        channel_name = props.get('channel')
-        factor = props['factor']
+    Parameters
+    ----------
+    factor : str, int or float
+        Factor value or arithmetic expression.
 
-        signals[signame] = data
+    Returns
+    -------
+    float
+        Evaluated factor.
 
-        # add time to signals dict
-        if 'time' not in signals:
-            rate = data_channel.properties['RATE']
-            dt = 1 / rate
-            t_len = len(signals[signame])
-            time = np.linspace(0.0, (t_len * dt) * 1000, num=t_len)  # [ms]
-            signals['time'] = time
+    Raises
+    ------
+    ValueError
+        If factor is not a valid arithmetic expression.
+    """
+    return _parse_factor_expression(str(factor).strip())
 
-    return signals
 
-def load(cfg_path: str, cfg=None) -> dict:
+@lru_cache(maxsize=None)
+def _parse_factor_expression(expression: str) -> float:
+    """ Evaluates factor expression string, see parse_factor """
+    try:
+        tree = ast.parse(expression, mode='eval')
+        value = _eval_factor_node(tree.body)
+    except (SyntaxError, ValueError, TypeError, ZeroDivisionError,
+            OverflowError) as e:
+        raise ValueError(f"Неверный множитель '{expression}': {e}") from e
+    if not np.isfinite(value):
+        raise ValueError(f"Неверный множитель '{expression}': "
+                         "значение не конечно")
+    return value
+
+
+def _apply_factor(data, gain: float, offset: float, factor) -> np.ndarray:
+    """
+    Calculates (data * gain + offset) * factor in one in-place pass.
+
+    gain, offset and factor are folded into a single scale/shift pair.
+    data is overwritten if it is already a float64 array.
+    """
+    factor = parse_factor(factor)
+    scale, shift = gain * factor, offset * factor
+    data = np.asarray(data, dtype=np.float64)
+    np.multiply(data, scale, out=data)
+    if shift:
+        data += shift
+    return data
+
+
+def _time_step(rate: float, t_len: int) -> float:
+    """ Time track step in [ms] for channel with given rate and length """
+    if t_len <= 1:
+        return 1000.0 / rate
+    # same step as np.linspace(0.0, (t_len * dt) * 1000, num=t_len)
+    return (t_len / rate) * 1000 / (t_len - 1)
+
+
+def _sample_range(t_range, rate: float, t_len: int) -> tuple:
+    """
+    Converts time window to sample offsets of a channel.
+
+    Parameters
+    ----------
+    t_range : tuple(float, float) or None
+        Time window (t0, t1) in [ms]. None means the whole channel.
+    rate : float
+        Channel sampling rate in [Hz] (RATE property).
+    t_len : int
+        Channel length in samples.
+
+    Returns
+    -------
+    (i0, i1) : tuple(int, int)
+        Sample range [i0, i1) with time values within t_range.
+    """
+    if t_range is None:
+        return 0, t_len
+    t0, t1 = t_range
+    if t0 > t1:
+        raise ValueError(f"Неверный временной диапазон: {t_range}")
+    step = _time_step(rate, t_len)
+    i0 = min(max(int(np.ceil(t0 / step)), 0), t_len)
+    i1 = min(max(int(np.floor(t1 / step)) + 1, i0), t_len)
+    return i0, i1
+
+
+def load(cfg_path: str, cfg=None, t_range=None, cache=None) -> dict:
     """
     Load LP signals using config file.
 
+    TDMS file is opened in streaming mode, so only channels mapped in
+    cfg['signals'] are read into memory. A channel mapped to several signals
+    is read once. If t_range is given only samples within the time window
+    are read from the TDMS segments.
+
     Parameters
     ----------
     cfg_path : str
         Path to config file.
+    cfg : dict, optional
+        Config dict used if cfg_path is None.
+    t_range : tuple(float, float), optional
+        Time window (t0, t1) in [ms] to load. Converted to sample offsets
+        using channel RATE property. The default is None (whole signal).
+    cache : ShotCache, optional
+        On-disk cache of loaded signals. If given, signals are taken from
+        cache (memory-mapped, read-only) when file and config are unchanged
+        and stored in cache otherwise. The default is None (no cache).
 
     Returns
     -------
@@ -123,35 +372,148 @@ def load(cfg_path: str, cfg=None) -> dict:
         raise ValueError("Отсутствует путь к TDMS файлу")
     input_path = str(Path(cfg['tdms_path']).resolve())
 
+    # take already loaded signals from cache if file and config are the same
+    if cache is not None:
+        cache_key = cache.key(input_path, cfg['signals'], t_range)
+        signals = cache.get(cache_key)
+        if signals is not None:
+            return signals
+
     # create signals dict already factored
     signals = {}
     signals['shot'] = extract_shot_number(input_path)
 
-    # load tdms file LP
+    # open tdms file LP in streaming mode: only channels listed in
+    # cfg['signals'] are read from disk, the rest of the group is skipped
     with TdmsFile.open(input_path) as tdms_file:
-        tdms_file = TdmsFile.read(input_path)
+        group = tdms_file[GROUP]
+        raw_data = {}  # channel_name: raw data (one read per channel)
+        # how many signals use every channel, last one may scale in-place
+        channel_uses = Counter(props['channel']
+                               for props in cfg['signals'].values())
+
+        for signame, props in cfg['signals'].items():
+            channel_name = props['channel']
+            factor = props['factor']
+
+            # get and factor signals from tdms
+            data_channel = group[channel_name]
+            rate = data_channel.properties['RATE']
+            i0, i1 = _sample_range(t_range, rate, len(data_channel))
+            if channel_name not in raw_data:
+                raw_data[channel_name] = data_channel.read_data(
+                    offset=i0, length=i1 - i0)
+            gain = data_channel.properties['GAIN']
+            offset = data_channel.properties['Offset'] * 0.0
+
+            # raw data shared with other signals is copied before scaling
+            channel_uses[channel_name] -= 1
+            if channel_uses[channel_name] > 0:
+                data = raw_data[channel_name].copy()
+            else:
+                data = raw_data.pop(channel_name)
+            signals[signame] = _apply_factor(data, gain, offset, factor)
+
+            # add time to signals dict
+            if 'time' not in signals:
+                step = _time_step(rate, len(data_channel))
+                time = np.linspace(i0 * step, (i1 - 1) * step,
+                                   num=i1 - i0)  # [ms]
+                signals['time'] = time
+
+    if cache is not None:
+        cache.put(cache_key, signals)
 
-    for signame, props in cfg['signals'].items():
-        channel_name = props['channel']
-        factor = props['factor']
+    return signals
 
-        # get and factor signals from tdms
-        data_channel = tdms_file[GROUP][channel_name]
-        gain = data_channel.properties['GAIN']
-        offset = data_channel.properties['Offset'] * 0.0
 
-        data = (data_channel[:] * gain + offset) * eval(str(factor))
-        signals[signame] = data
+def find_shot_files(paths, pattern: str = "T15MD_*.tdms") -> list:
+    """
+    Collects shot files from a directory, a glob pattern or a list of paths.
 
-        # add time to signals dict
-        if 'time' not in signals:
-            rate = data_channel.properties['RATE']
-            dt = 1 / rate
-            t_len = len(signals[signame])
-            time = np.linspace(0.0, (t_len * dt) * 1000, num=t_len)  # [ms]
-            signals['time'] = time
+    Parameters
+    ----------
+    paths : str, Path or list
+        Directory (files matching pattern are taken), glob pattern
+        (e.g. "C:/data/T15MD_30*.tdms") or list of file paths.
+    pattern : str, optional
+        File name pattern used for directories. The default is "T15MD_*.tdms".
 
-    return signals
+    Returns
+    -------
+    list
+        Sorted list of file paths.
+    """
+    if isinstance(paths, (list, tuple)):
+        return [str(path) for path in paths]
+    if Path(paths).is_dir():
+        return sorted(str(path) for path in Path(paths).glob(pattern))
+    return sorted(glob.glob(str(paths)))
+
+
+def _load_to_cache(input_path, signals_cfg, t_range, cache_path,
+                   cache_size):
+    """ Worker: loads one shot into cache, returns (shot, cache key) """
+    cache = ShotCache(cache_path, cache_size)
+    cfg = {'tdms_path': input_path, 'signals': signals_cfg}
+    load(None, cfg, t_range=t_range, cache=cache)
+    return extract_shot_number(input_path), cache.key(input_path, signals_cfg,
+                                                      t_range)
+
+
+def load_many(paths, signals_cfg: dict, t_range=None, cache=None,
+              workers=None):
+    """
+    Load many shots in parallel using the same signals mapping.
+
+    Shots are loaded in worker processes into on-disk cache, so only cache
+    keys are sent back to the parent process and signals are opened
+    memory-mapped instead of being pickled.
+
+    Parameters
+    ----------
+    paths : str, Path or list
+        Directory with T15MD_*.tdms files, glob pattern or list of paths.
+    signals_cfg : dict
+        Signals mapping, same as cfg['signals'] of load function.
+    t_range : tuple(float, float), optional
+        Time window (t0, t1) in [ms] to load. The default is None.
+    cache : ShotCache, optional
+        Cache used to pass signals from workers. The default is ShotCache().
+    workers : int, optional
+        Number of worker processes. The default is None (CPU count).
+
+    Yields
+    ------
+    (shot, signals) : tuple(int, dict)
+        Shot number and signals dict (as load returns) in completion order.
+    """
+    if cache is None:
+        cache = ShotCache()
+    input_paths = find_shot_files(paths)
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    futures = {}
+    try:
+        futures = {
+            executor.submit(_load_to_cache, input_path, signals_cfg, t_range,
+                            str(cache.path), cache.max_size): input_path
+            for input_path in input_paths
+            }
+        for future in as_completed(futures):
+            shot, key = future.result()
+            signals = cache.get(key)
+            if signals is None:
+                # entry was evicted by other workers, load it here
+                cfg = {'tdms_path': futures[future], 'signals': signals_cfg}
+                signals = load(None, cfg, t_range=t_range, cache=cache)
+            yield shot, signals
+    finally:
+        # pending shots are not loaded if iteration is stopped
+        # (shutdown(cancel_futures=True) needs python 3.9)
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
 
 
 # %%
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
 """ init file for models subpackage """
-from .te_ne_analyzer import TeNeAnalyzer, PROBE_AREA_DEFAULT, M_I_DEFAULT
-from .span_detector import SpanDetector
+from .te_ne_analyzer import (TeNeAnalyzer, TeNeResults, CVPlotData,
+                             PROBE_AREA_DEFAULT, M_I_DEFAULT)
+from .span_detector import SpanDetector, ChunkedSpanDetector
+from .multi_probe_analyzer import MultiProbeAnalyzer
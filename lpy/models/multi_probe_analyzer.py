@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Ammosov
+
+MultiProbeAnalyzer: Te and ne of many probes with the same probe voltage.
+"""
+from ..processing import smooth
+from ..parallel import map_ordered, resolve_workers
+from .span_detector import SpanDetector
+from .te_ne_analyzer import TeNeAnalyzer, _key
+
+
+class MultiProbeAnalyzer():
+    """
+    Calculates Te and ne of all probes sharing voltage derived work.
+
+    Voltage smoothing for span detection, voltage minima and voltage
+    smoothing for fit (smooth_u) are calculated once, then every probe
+    current is processed by its own TeNeAnalyzer, probes are processed in
+    threads if workers > 1. Analyzers and smoothed signals are kept for next
+    calls, so only changed smoothing is recalculated.
+
+    Parameters
+    ----------
+    t : ndarray
+        1D array of time values in [ms].
+    u : ndarray
+        1D array of probe voltage in [V].
+    currents : dict
+        Probe currents in [mA]: {probe_name: 1D array}.
+
+    Example:
+        mpa = MultiProbeAnalyzer(t, u, {'LP.09': i9, 'LP.13': i13})
+        results = mpa.calc_te_ne(parameters)
+        res_t, te, ne, info = results['LP.13']
+        cv_plot_data = mpa.analyzers['LP.13'].cv_plot_data
+    """
+    def __init__(self, t, u, currents):
+        self.t, self.u, self.currents = t, u, currents
+        self.analyzers = {}
+        self.u_smooth, self.u_mins = None, None
+        self._u_fit = (None, None) # (smooth_u, smoothed voltage)
+
+    def calc_te_ne(self, parameters={}, probes=None, workers=1):
+        """
+        Calculate Te [eV] and ne values of probes
+
+        Parameters
+        ----------
+        parameters : dict, optional
+            Same as in TeNeAnalyzer.calc_te_ne. The default is {}.
+        probes : list, optional
+            Probe names to process. The default is None (all currents).
+        workers : int, optional
+            Amount of workers, -1 for all CPUs. Probes are processed in
+            threads, except 'exponential' fit method, which fits windows of
+            every probe in worker processes. Results do not depend on
+            workers. The default is 1.
+
+        Returns
+        -------
+        dict
+            {probe_name: TeNeResults} in probes order, results are unpacked
+            as (res_t, res_te, res_ne, res_info).
+        """
+        # voltage derived work depends on voltage only
+        if self.u_smooth is None:
+            self.u_smooth, self.u_mins = SpanDetector.smooth_voltage(self.u)
+
+        # pylint: disable=protected-access
+        params = TeNeAnalyzer._get_parameters(parameters)
+        if self._u_fit[0] != _key(params['smooth_u']):
+            self._u_fit = (_key(params['smooth_u']),
+                           smooth(self.u, *params['smooth_u']))
+        u_fit = self._u_fit[1]
+
+        # curve_fit holds the GIL, so its windows go to processes instead
+        if params['fit_method'] == 'exponential':
+            probe_workers, fit_workers = 1, workers
+        else:
+            probe_workers, fit_workers = workers, 1
+
+        def calc_probe(probe_name):
+            tna = self.analyzers.get(probe_name)
+            if tna is None or tna.i is not self.currents[probe_name]:
+                tna = TeNeAnalyzer(self.t, self.u, self.currents[probe_name])
+            # pylint: disable=protected-access
+            tna._calc_spans(dt_range_te=params['dt_range_te'],
+                            sweep_direction=params['sweep_direction'],
+                            dt_range_ne=params['dt_range_ne'],
+                            u_smooth=self.u_smooth, u_mins=self.u_mins)
+            tna.u_smoothed = u_fit
+            tna.i_smoothed = tna.smoothed(tna.i, *params['smooth_i'])
+            # pylint: disable=protected-access
+            res, tna.cv_plot_data = tna._calc_windows(params, fit_workers)
+            return tna, res
+
+        probes = probes or list(self.currents)
+        results = {}
+        for probe_name, (tna, res) in zip(probes, map_ordered(
+                calc_probe, probes, resolve_workers(probe_workers))):
+            results[probe_name] = res
+            self.analyzers[probe_name] = tna
+        return results
@@ -13,7 +13,13 @@ to determine relevant time intervals for analysis.
 
 import numpy as np
 from scipy.signal import argrelextrema
-from ..processing import smooth
+from ..processing import smooth, smooth_range, smooth_margin
+
+# smoothing (box size, iterations) of voltage and current
+U_SMOOTH = (151, 11)
+I_SMOOTH = (71, 11)
+# amount of samples processed at once by ChunkedSpanDetector
+CHUNK_SIZE_DEFAULT = 1 << 20
 
 
 class SpanDetector():
@@ -28,6 +34,12 @@ class SpanDetector():
         1D array of probe voltage in [V].
     i : ndarray
         1D array of probe current in [mA].
+    u_smooth : ndarray, optional
+        Precomputed smoothed voltage (see smooth_voltage), e.g. shared by
+        probes with the same voltage. The default is None (calculated).
+    u_mins : ndarray, optional
+        Precomputed indices of u_smooth minima. The default is None
+        (calculated).
 
     Example:
         spandet = SpanDetector(t, u, i)
@@ -48,51 +60,62 @@ class SpanDetector():
         indices of relevant local maxima in di near u_mins.
     """
 
-    def __init__(self, t, u, i):
+    def __init__(self, t, u, i, u_smooth=None, u_mins=None):
         self.t, self.u, self.i = t, u, i
-        self._calc_repere_points()
+        self._calc_repere_points(u_smooth, u_mins)
+
+    @staticmethod
+    def smooth_voltage(u):
+        """
+        Smoothed voltage and indices of its minima.
 
-    def _calc_repere_points(self):
+        Depends on voltage only, so it may be calculated once for all probes
+        and passed to SpanDetector as u_smooth and u_mins.
+        """
+        u_smooth = smooth(u, *U_SMOOTH)
+        return u_smooth, argrelextrema(u_smooth, np.less)[0]
+
+    def _calc_repere_points(self, u_smooth=None, u_mins=None):
         """Compute key reference points (minima/maxima) for span detection."""
         # smooth u, calc gradient of i (di), smooth di
-        u_smooth = smooth(self.u, 151, 11)
-        i_smooth = smooth(self.i, 71, 11)
+        if u_smooth is None:
+            u_smooth, u_mins = self.smooth_voltage(self.u)
+        elif u_mins is None:
+            u_mins = argrelextrema(u_smooth, np.less)[0]
+        i_smooth = smooth(self.i, *I_SMOOTH)
         di = np.gradient(i_smooth)
-        di = smooth(di, 71, 11)
+        di = smooth(di, *I_SMOOTH)
 
         # save smoothed u and di
         self.u_smooth, self.di = u_smooth, di*500
-        # calc minimums of u
-        self.u_mins = argrelextrema(u_smooth, np.less)[0]
+        # minimums of u
+        self.u_mins = u_mins
         # extract proper repere points of di
         self.di_mins = self._extract_di_mins(argrelextrema(di, np.less)[0])
         self.di_maxs = self._extract_di_maxs(argrelextrema(di, np.greater)[0])
 
     def _extract_di_mins(self, di_mins_all):
         """Extract di minima nearest to each u minimum."""
-        di_mins_ok = []
-        for umin in self.u_mins:
-            for i, imax in enumerate(di_mins_all):
-                if imax > umin:
-                    if i == 0:
-                        continue
-                    # first to the left from u_min
-                    di_mins_ok.append(di_mins_all[i-1])
-                    break
-        return np.asarray(di_mins_ok)
+        # first to the left from u_min
+        return di_mins_all[self._first_right_of_u_mins(di_mins_all) - 1]
 
     def _extract_di_maxs(self, di_maxs_all):
         """Extract di maxima nearest to each u minimum."""
-        di_maxs_ok = []
-        for umin in self.u_mins:
-            for i, imax in enumerate(di_maxs_all):
-                if imax > umin:
-                    if i == 0:
-                        continue
-                    # first to the right from u_min
-                    di_maxs_ok.append(di_maxs_all[i])
-                    break
-        return np.asarray(di_maxs_ok)
+        # first to the right from u_min
+        return di_maxs_all[self._first_right_of_u_mins(di_maxs_all)]
+
+    def _first_right_of_u_mins(self, extrema):
+        """
+        Indices of first extrema to the right from each u minimum.
+
+        Extrema are sorted, so all u minima are matched at once with
+        np.searchsorted in O((N+M) log M). If the first extremum to the right
+        is the very first one (index 0), the next one is taken. u minima
+        without extremum to the right are skipped.
+        """
+        idx = np.searchsorted(extrema, self.u_mins, side='right')
+        idx = np.maximum(idx, 1)
+        return idx[idx < len(extrema)]
 
     def spans(self, dt_range_te=None, dt_range_ne=(2, 2),
               sweep_direction='up'):
@@ -222,6 +245,33 @@ class SpanDetector():
 
         return (l_new, r_new)
 
+    def _shift_spans_boundaries(self, spans, left_shift, right_shift, id_max):
+        """
+        Adjusts boundaries of all spans at once with boolean masks.
+
+        Same rules as _shift_span_boundaries applied to (N, 2) spans array.
+        """
+        l_old, r_old = spans[:, 0], spans[:, 1]
+        l_new, r_new = l_old, r_old
+
+        # Process left shift if specified, revert invalid ones
+        if left_shift is not None:
+            l_new = l_old + left_shift
+            left_invalid = (l_new < 0) | (l_new > id_max) | (l_new >= r_old)
+            l_new = np.where(left_invalid, l_old, l_new)
+
+        # Process right shift if specified, revert invalid ones
+        if right_shift is not None:
+            r_new = r_old - right_shift
+            right_invalid = (r_new < 0) | (r_new > id_max) | (r_new <= l_old)
+            r_new = np.where(right_invalid, r_old, r_new)
+
+        # Final validation: original span if boundaries cross
+        crossed = l_new >= r_new
+        l_new = np.where(crossed, l_old, l_new)
+        r_new = np.where(crossed, r_old, r_new)
+        return np.column_stack((l_new, r_new))
+
     def _dt_mask(self, spans, dt_range):
         """Adjust span boundaries by time shifts."""
 
@@ -234,13 +284,133 @@ class SpanDetector():
         id_left, id_right = int(dt_range[0]/dt), int(dt_range[1]/dt)
         id_max = len(self.t) - 1
 
-        spans_shifted = []
-        for span in spans:
-            span_shifted = self._shift_span_boundaries(span, id_left,
-                                                      id_right, id_max)
-            spans_shifted.append(span_shifted)
-        return np.asarray(spans_shifted)
+        spans = np.asarray(spans).reshape(-1, 2)
+        return self._shift_spans_boundaries(spans, id_left, id_right, id_max)
 
     def _column_stack_arrays(self, x, y):
         """ stacks two arrays even if lengths are different (by shortest) """
-        return np.array(list(zip(x, y)))
+        size = min(len(x), len(y))
+        # contiguous (N, 2) array of x, y dtype
+        return np.column_stack((x[:size], y[:size]))
+
+
+class ChunkedSpanDetector(SpanDetector):
+    """
+    Detects the same spans as SpanDetector processing signals by chunks.
+
+    Signals are smoothed and searched for extrema chunk by chunk with
+    overlaps sized by smoothing margins, so memory is bounded by chunk size
+    instead of signal length (t, u, i may be memory-mapped). Spans are
+    yielded as soon as their repere points are found.
+
+    Parameters
+    ----------
+    t : ndarray
+        1D array of time values in [ms].
+    u : ndarray
+        1D array of probe voltage in [V].
+    i : ndarray
+        1D array of probe current in [mA].
+    chunk_size : int, optional
+        Amount of samples in a chunk. The default is CHUNK_SIZE_DEFAULT.
+
+    Example:
+        spandet = ChunkedSpanDetector(t, u, i, chunk_size=2**20)
+        for spans_te, spans_ne in spandet.iter_spans(dt_range_te=(0, 0)):
+            ...
+    """
+
+    def __init__(self, t, u, i, chunk_size=CHUNK_SIZE_DEFAULT):
+        # pylint: disable=super-init-not-called
+        self.t, self.u, self.i = t, u, i
+        self.chunk_size = max(int(chunk_size), 1)
+
+    def _chunk_repere_points(self, c0, c1):
+        """
+        Repere points of chunk [c0, c1) in global indices.
+
+        Returns u minima and all di minima and maxima, equal to ones of
+        SpanDetector found within chunk.
+        """
+        size = len(self.u)
+        # one more sample at each side to compare neighbours
+        e0, e1 = max(c0 - 1, 0), min(c1 + 1, size)
+        u_smooth = smooth_range(self.u, e0, e1, *U_SMOOTH)
+
+        # di on [e0, e1) is smoothed from gradient with margins, which is
+        # calculated from smoothed current with one more sample at each side
+        d0 = max(e0 - smooth_margin(*I_SMOOTH), 0)
+        d1 = min(e1 + smooth_margin(*I_SMOOTH), size)
+        g0, g1 = max(d0 - 1, 0), min(d1 + 1, size)
+        i_smooth = smooth_range(self.i, g0, g1, *I_SMOOTH)
+        di = np.gradient(i_smooth)[d0-g0:d1-g0] if len(i_smooth) > 1 \
+            else np.zeros(d1 - d0)
+        di = smooth(di, *I_SMOOTH)[e0-d0:e1-d0]
+
+        def in_chunk(idx):
+            idx = idx + e0
+            return idx[(c0 <= idx) & (idx < c1)]
+
+        return (in_chunk(argrelextrema(u_smooth, np.less)[0]),
+                in_chunk(argrelextrema(di, np.less)[0]),
+                in_chunk(argrelextrema(di, np.greater)[0]))
+
+    def iter_spans(self, dt_range_te=None, dt_range_ne=(2, 2),
+                   sweep_direction='up'):
+        """
+        Yields corresponding spans for Te and ne chunk by chunk.
+
+        Parameters are the same as in SpanDetector.spans. Concatenated
+        yielded spans are equal to SpanDetector.spans results.
+
+        Yields
+        ------
+        tuple(ndarray, ndarray)
+            New (start, end) arrays of Te spans and ne spans of same length.
+        """
+        if sweep_direction not in ('up', 'down'):
+            raise KeyError(sweep_direction)
+
+        u_mins = np.zeros(0, dtype=np.int64) # not used in spans yet
+        extrema = np.zeros(0, dtype=np.int64) # di extrema still needed
+        n_dropped = 0 # amount of di extrema removed from start
+        n_spans = 0
+        for c0 in range(0, len(self.u), self.chunk_size):
+            c1 = min(c0 + self.chunk_size, len(self.u))
+            u_mins_new, di_mins_new, di_maxs_new = \
+                self._chunk_repere_points(c0, c1)
+            u_mins = np.concatenate((u_mins, u_mins_new))
+            extrema = np.concatenate((extrema, di_maxs_new
+                                      if sweep_direction == 'up'
+                                      else di_mins_new))
+
+            # first extremum to the right from u minimum (global index),
+            # it is known if it is before end of chunk
+            idx = np.searchsorted(extrema, u_mins, side='right') + n_dropped
+            idx = np.maximum(idx, 1) - n_dropped
+            n_te = np.count_nonzero(idx < len(extrema))
+            # ne span needs next u minimum
+            n_new = min(n_te, len(u_mins) - 1)
+            if n_new == 0:
+                continue
+
+            if sweep_direction == 'up':
+                spans_te = self._column_stack_arrays(
+                    u_mins[:n_new], extrema[idx[:n_new]])
+            else:
+                spans_te = self._column_stack_arrays(
+                    extrema[idx[:n_new] - 1], u_mins[:n_new])
+            spans_ne = self._column_stack_arrays(u_mins[:n_new],
+                                                 u_mins[1:n_new+1])
+            n_spans += n_new
+
+            # keep extrema from one before first right of next u minimum
+            n_drop = max(idx[n_new] - 1, 0)
+            extrema = extrema[n_drop:]
+            n_dropped += n_drop
+            u_mins = u_mins[n_new:]
+            yield (self._dt_mask(spans_te, dt_range_te),
+                   self._dt_mask(spans_ne, dt_range_ne))
+
+        if n_spans == 0:
+            raise ValueError("Empty span array detected")
@@ -9,13 +9,45 @@ import numpy as np
 from scipy.stats import linregress
 from scipy.optimize import curve_fit
 from scipy.constants import physical_constants
-from numpy.lib.stride_tricks import sliding_window_view
-from ..processing import exp, remove_negatives, is_valid_positive, smooth
-from  .span_detector import SpanDetector
+from ..processing import (exp, remove_negatives, is_valid_positive, smooth,
+                          smooth_range, nearest_index)
+from ..fitting import (span_indices, span_offsets, span_sums, sliding_sums,
+                       window_sums, linear_fit_sums, exp_fit_windows,
+                       FIT_FAILED, FIT_CONVERGED, FIT_PROGRESS_STEPS)
+from ..parallel import map_ordered, chunk_slices, resolve_workers
+from  .span_detector import (SpanDetector, ChunkedSpanDetector,
+                             CHUNK_SIZE_DEFAULT)
 #%% Default params
 PROBE_AREA_DEFAULT = (np.pi*(5)**2) * np.sin(np.deg2rad(15)) / 4
 M_I_DEFAULT = physical_constants['proton mass in u'][0]
+EXP_FIT_BOUNDS = (-10, 10) # bounds of k and c as in _te_exponential_fit
+PARAMETERS_DEFAULT = {
+    'u_range': (0, 0),
+    'n_avg': 1,
+    'te_threshold': 0,
+    'sweep_direction': 'up',
+    'probe_area': PROBE_AREA_DEFAULT,
+    'm_i': M_I_DEFAULT,
+    'smooth_u': (1, 1),
+    'smooth_i': (1, 1),
+    'dt_range_ne': (2, 2),
+    'dt_range_te': (0, 0),
+    'fit_method': 'linear',
+    }
+SMOOTH_CACHE_SIZE = 8 # smoothed signals kept by analyzer
+# window of Current-Voltage Plot: samples range, fit and time
+CV_WINDOW_DTYPE = np.dtype([('start', np.int64), ('end', np.int64),
+                            ('k', np.float64), ('c', np.float64),
+                            ('time_mean', np.float64)])
+# columns of TeNeResults
+RESULT_COLUMNS = ('t', 'te', 'ne', 'k', 'c', 'kerr', 'cerr', 'n_samples',
+                  'status')
 #%%
+def _key(value):
+    """ Hashable cache key of range parameter, which may be None """
+    return None if value is None else tuple(value)
+
+
 class TeNeAnalyzer():
     """
     Calculates electron temperature on given spans.
@@ -29,6 +61,9 @@ class TeNeAnalyzer():
     i : ndarray
         1D array of probe current in [mA].
 
+    Signals t, u, i are not modified, smoothed signals used for fitting are
+    saved in u_smoothed, i_smoothed and cached for next calls.
+
     Example:
         tna = TeNeAnalyzer(t, u, i, spans_te, spans_ne)
         te, info = tna.calc_te(n_avg, u_range, fit_method='linear')
@@ -36,9 +71,14 @@ class TeNeAnalyzer():
     """
     def __init__(self, t, u, i):
         self.t, self.u, self.i = t, u, i
+        self.u_smoothed, self.i_smoothed = u, i
+        self._smooth_cache = {}
+        self._stages = {} # cached pipeline stages: {stage: (key, output)}
+        self._span_times = (None, None, None) # (spans_te, valid, times)
         self.spandet, self.spans_te, self.spans_ne = None, None, None
+        self.fit_status = None
 
-    def calc_te_ne(self, parameters={}):
+    def calc_te_ne(self, parameters={}, workers=1, progress=None):
         """
         Calculate Te [eV] values for each Te span
 
@@ -71,111 +111,298 @@ class TeNeAnalyzer():
         dt_range_te : tuple(float, float), Default: (0,0)
             Adjust Te spans boundaries by time in [ms].
         fit_method : str, Default: 'linear'
-            Fit method using in calculating Te. 'linear' or 'exponential'.
+            Fit method using in calculating Te. 'linear', 'exponential'
+            (curve_fit of every window) or 'exponential_fast' (vectorised
+            fit of all windows, status is saved in fit_status).
+        workers : int, optional
+            Amount of workers for fitting windows: processes for
+            'exponential', threads for 'exponential_fast' ('linear' is
+            always serial). -1 for all CPUs. Results do not depend on
+            workers. The default is 1.
+        progress : callable, optional
+            progress(done, total) is called for every fitted window. It may
+            raise an exception to cancel calculation, cached results stay
+            valid. The default is None.
+
         Returns
         -------
-        (res_t, res_te, res_ne, res_info) : tuple(np.array,...)
+        TeNeResults
+            Columns of windows, unpacked as (res_t, res_te, res_ne, res_info):
             time, Te, ne, info (contains fit parameters k, c, kerr, cerr).
         """
-        # setup parameters and defaults
-        u_range = parameters.get('u_range', (0,0))
-        n_avg = parameters.get('n_avg', 1)
-        te_threshold = parameters.get('te_threshold', 0)
-        sweep_direction = parameters.get('sweep_direction', 'up')
-        probe_area = parameters.get('probe_area', PROBE_AREA_DEFAULT)
-        m_i = parameters.get('m_i', M_I_DEFAULT)
-        smooth_u = parameters.get('smooth_u', (1,1))
-        smooth_i = parameters.get('smooth_i', (1,1))
-        dt_range_ne = parameters.get('dt_range_ne', (2,2))
-        dt_range_te = parameters.get('dt_range_te', (0,0))
-        fit_method = parameters.get('fit_method', 'linear')
+        parameters = self._get_parameters(parameters)
 
         # calculate spans for Te and ne
-        self._calc_spans(dt_range_te=dt_range_te,
-                        sweep_direction=sweep_direction,
-                        dt_range_ne=dt_range_ne)
+        self._calc_spans(dt_range_te=parameters['dt_range_te'],
+                        sweep_direction=parameters['sweep_direction'],
+                        dt_range_ne=parameters['dt_range_ne'])
 
         # smooth U and I if needed
-        self.u = smooth(self.u, *smooth_u)
-        self.i = smooth(self.i, *smooth_i)
+        self.u_smoothed = self.smoothed(self.u, *parameters['smooth_u'])
+        self.i_smoothed = self.smoothed(self.i, *parameters['smooth_i'])
 
-        # check window size positive or set 1
-        if not is_valid_positive(n_avg):
-            n_avg = 1
-        spans_windowed_te = sliding_window_view(self.spans_te,
-                                    window_shape=(int(n_avg), 2))
-        spans_windowed_ne = sliding_window_view(self.spans_ne,
-                                    window_shape=(int(n_avg), 2))
-
-        # Current-Voltage Plot data list: u_wide, i_wide, u, i, k, c, time_mean
-        cv_plot_data = []
-        res_t, res_te, res_ne, res_info = [], [], [], [] # result lists
-        for spans_te, spans_ne in zip(spans_windowed_te, spans_windowed_ne):
-            tt, uu, ii, ii_ne = np.array([]), np.array([]), np.array([]), np.array([])
-            for span_te, span_ne in zip(spans_te[0], spans_ne[0]):
-                i0, i1 = span_te
-                j0, j1 = span_ne
-                tt = np.concatenate((tt, self.t[i0:i1]))
-                uu = np.concatenate((uu, self.u[i0:i1]))
-                ii = np.concatenate((ii, self.i[i0:i1]))
-                ii_ne = np.concatenate((ii_ne, self.i[j0:j1]))
-
-            # if nothing in spans add zeros to results
-            if len(tt) == 0 or len(uu) == 0 or len(ii) == 0:
-                # add zeros to results
-                res = [0, 0, 0, 0]
-                self._add_results(res_t, res_te, res_ne, res_info, res)
-                cv_plot_data.append(([], [], [], [], 0, 0))
+        results, cv_plot_data = self._calc_windows(parameters, workers,
+                                                   progress)
+        self.cv_plot_data = cv_plot_data # save data for Current-Voltage Plot
+        return results
+
+    def iter_te_ne(self, parameters={}, chunk_size=CHUNK_SIZE_DEFAULT):
+        """
+        Calculate Te [eV] and ne values chunk by chunk (streaming mode)
+
+        Spans are detected by ChunkedSpanDetector and windows are calculated
+        from parts of signals as soon as their spans are found, so memory is
+        bounded by chunk size, not by signal length (t, u, i may be
+        memory-mapped). Signals are not modified and Current-Voltage plot
+        data is not saved.
+
+        Parameters
+        ----------
+        parameters : dict, optional
+            Same as in calc_te_ne. The default is {}.
+        chunk_size : int, optional
+            Amount of samples in a chunk. The default is CHUNK_SIZE_DEFAULT.
+
+        Yields
+        ------
+        TeNeResults
+            Results of new windows, concatenated results (see
+            TeNeResults.concatenate) are equal to calc_te_ne results.
+        """
+        parameters = self._get_parameters(parameters)
+        n_avg = parameters['n_avg']
+
+        spandet = ChunkedSpanDetector(self.t, self.u, self.i, chunk_size)
+        spans_te = spans_ne = np.zeros((0, 2), dtype=np.int64)
+        for spans_te_new, spans_ne_new in spandet.iter_spans(
+                dt_range_te=parameters['dt_range_te'],
+                dt_range_ne=parameters['dt_range_ne'],
+                sweep_direction=parameters['sweep_direction']):
+            spans_te = np.concatenate((spans_te, spans_te_new))
+            spans_ne = np.concatenate((spans_ne, spans_ne_new))
+            if len(spans_te) < n_avg:
                 continue
 
-            te, info = self._fit_data(uu, ii, u_range, fit_method=fit_method)
-            time_mean = tt.mean()
-            # for Current-Voltage Plot
-            u_m, i_m = self._u_mask(uu, ii, u_range) # masked by u_range
-            # u_wide, i_wide, u, i, k, c, time_mean
-            cv_plot_data.append((uu, ii, u_m, i_m, info[0], info[1], time_mean))
+            yield self._calc_windows_range(spans_te, spans_ne, parameters)
+            # last spans are shared with next windows
+            spans_te = spans_te[len(spans_te) - n_avg + 1:]
+            spans_ne = spans_ne[len(spans_ne) - n_avg + 1:]
 
-            # mean value of currents
-            i_is = np.mean(ii_ne)
-            ne = self._ne_formula(te, i_is, probe_area, m_i)
+    def smoothed(self, x, avg=1, n=1):
+        """
+        Smoothed signal (see processing.smooth) memoised by (id(x), avg, n).
 
-            res = [time_mean, te, ne, info]
-            self._add_results(res_t, res_te, res_ne, res_info, res=res)
+        Parameters
+        ----------
+        x : ndarray
+            Signal, must not be modified in place while analyzer is used.
+        avg : int, optional
+            Window size. The default is 1.
+        n : int, optional
+            Amount of repetitions. The default is 1.
+
+        Returns
+        -------
+        ndarray
+            Smoothed signal, the same array for the same arguments.
+        """
+        key = (id(x), avg, n)
+        if key not in self._smooth_cache:
+            if len(self._smooth_cache) >= SMOOTH_CACHE_SIZE:
+                # drop the oldest
+                self._smooth_cache.pop(next(iter(self._smooth_cache)))
+            # x is kept in cache, so its id is not reused
+            self._smooth_cache[key] = (x, smooth(x, avg, n))
+        return self._smooth_cache[key][1]
+
+    @staticmethod
+    def _get_parameters(parameters):
+        """ Parameters with defaults (see calc_te_ne) """
+        parameters = {**PARAMETERS_DEFAULT, **parameters}
+        # check window size positive or set 1
+        if not is_valid_positive(parameters['n_avg']):
+            parameters['n_avg'] = 1
+        parameters['n_avg'] = int(parameters['n_avg'])
+        return parameters
+
+    def _calc_windows_range(self, spans_te, spans_ne, parameters):
+        """ Calculate windows of spans using only signals within spans """
+        i0 = max(min(spans_te.min(), spans_ne.min()), 0)
+        i1 = min(max(spans_te.max(), spans_ne.max()), len(self.t))
+
+        tna = TeNeAnalyzer(self.t[i0:i1],
+                           smooth_range(self.u, i0, i1, *parameters['smooth_u']),
+                           smooth_range(self.i, i0, i1, *parameters['smooth_i']))
+        tna.spans_te, tna.spans_ne = spans_te - i0, spans_ne - i0
+        # pylint: disable=protected-access
+        results, _ = tna._calc_windows(parameters)
+        return results
+
+    def _cached(self, stage, key, calc):
+        """ Output of pipeline stage, calc() is called only if key changed """
+        if stage not in self._stages or self._stages[stage][0] != key:
+            self._stages[stage] = (key, calc())
+        return self._stages[stage][1]
+
+    def _calc_windows(self, parameters, workers=1, progress=None):
+        """
+        Calculate Te and ne of sliding windows of spans_te and spans_ne.
 
-        res_t = np.array(res_t)
-        res_te = np.array(res_te)
-        res_ne = np.array(res_ne)
-        res_info = np.array(res_info)
+        Every stage (window assembly, fits, ne) is cached with key of its
+        parameters and keys of previous stages, so only stages after
+        changed parameters are recalculated. Threshold is always applied.
 
-        # set peaks (by threshold) to zero if needed
+        Returns
+        -------
+        (results, cv_plot_data) : tuple(TeNeResults, CVPlotData)
+            Results of windows and Current-Voltage plot data.
+        """
+        n_avg, u_range = parameters['n_avg'], parameters['u_range']
+        key = (self._stages.get('spans', (None,))[0],
+               _key(parameters['smooth_u']), _key(parameters['smooth_i']),
+               n_avg)
+        windows = self._cached('windows', key,
+                               lambda: self._assemble_windows(n_avg))
+        key += (_key(u_range), parameters['fit_method'])
+        fits, cv_plot_data, self.fit_status = self._cached(
+            'fits', key,
+            lambda: self._fit_windows(windows, parameters, workers, progress))
+        key += (parameters['probe_area'], parameters['m_i'])
+        ne = self._cached('ne', key, lambda: self._ne_windows(
+            fits.te, windows['i_is_means'][:len(fits.te)],
+            parameters['probe_area'], parameters['m_i']))
+
+        # cached results are not modified
+        results = fits.copy()
+        results.ne[:] = ne
+        # set peaks (by threshold) to zero if needed, time, amount of
+        # samples and fit status are kept
+        te_threshold = parameters['te_threshold']
         if te_threshold:
-            mask = res_te > te_threshold
-            res_te[mask] = 0.0
-            res_ne[mask] = 0.0
-            res_info[mask] = 0.0
+            results.data[1:7, results.te > te_threshold] = 0.0
 
-        self.cv_plot_data = cv_plot_data # save data for Current-Voltage Plot
-        return (res_t, res_te, res_ne, res_info)
+        return results, cv_plot_data
+
+    def _assemble_windows(self, n_avg):
+        """
+        Samples of Te spans and window means of time and ne current.
+
+        Returns
+        -------
+        dict
+            n_windows, u_te, i_te, offsets_te, time_means, i_is_means.
+        """
+        n_windows = max(min(len(self.spans_te), len(self.spans_ne))
+                        - n_avg + 1, 0)
+        # samples of all Te spans gathered once, window is a slice of them
+        idx_te, offsets_te = span_indices(self.spans_te, len(self.t))
+        counts_te = offsets_te[n_avg:] - offsets_te[:-n_avg]
+        # window means of time and ne current from sums of spans
+        with np.errstate(divide='ignore', invalid='ignore'):
+            time_means = window_sums(self.t, self.spans_te, n_avg) / counts_te
+            offsets_ne = span_offsets(self.spans_ne, len(self.t))
+            i_is_means = (window_sums(self.i_smoothed, self.spans_ne, n_avg)
+                          / (offsets_ne[n_avg:] - offsets_ne[:-n_avg]))
+        return {'n_windows': n_windows, 'offsets_te': offsets_te,
+                'u_te': self.u_smoothed[idx_te],
+                'i_te': self.i_smoothed[idx_te],
+                'time_means': time_means, 'i_is_means': i_is_means}
+
+    def _fit_windows(self, windows, parameters, workers=1, progress=None):
+        """
+        Fit Current-Voltage plot of every window. progress(done, total) is
+        called with amount of fitted windows if given: after every batch or
+        chunk of windows fitted at once or after every window fitted one by
+        one, so progress is reported while fitting and may cancel it.
+
+        Returns
+        -------
+        (results, cv_plot_data, fit_status) : tuple
+            TeNeResults without ne (zeros for empty windows), Current-Voltage
+            plot data and fit status (see fit_status).
+        """
+        n_avg, u_range = parameters['n_avg'], parameters['u_range']
+        fit_method = parameters['fit_method']
+        n_windows, offsets_te = windows['n_windows'], windows['offsets_te']
+        u_te, i_te = windows['u_te'], windows['i_te']
+
+        fit_progress = None
+        if progress is not None:
+            def fit_progress(done, _total):
+                # fits may have more windows than spans of ne
+                progress(int(min(done, n_windows)), n_windows)
+        # fits of all windows at once
+        fit_windows = {
+            'linear': lambda: self._te_linear_fit_windows(n_avg, u_range,
+                                                          fit_progress),
+            'exponential_fast': lambda: self._te_exponential_fit_windows(
+                n_avg, u_range, workers, fit_progress),
+            }
+        if resolve_workers(workers) > 1:
+            # curve_fit of every window in worker processes
+            fit_windows['exponential'] = lambda: self._te_fit_windows_each(
+                u_te, i_te, offsets_te, n_windows, n_avg, u_range, workers,
+                fit_progress)
+        results = TeNeResults(n_windows)
+        starts = offsets_te[:n_windows]
+        ends = offsets_te[n_avg:n_avg + n_windows]
+        results.n_samples[:] = ends - starts
+        # windows without samples are left zero
+        filled = ends > starts
+
+        self.fit_status = None
+        if progress is not None:
+            progress(0, n_windows)
+        if fit_method in fit_windows:
+            te_fits, info_fits = fit_windows[fit_method]()
+        else:
+            # windows are fitted one by one in place
+            te_fits, info_fits = results.te, results.info
+            for n_win in np.flatnonzero(filled).tolist():
+                if progress is not None:
+                    progress(n_win, n_windows)
+                te_fits[n_win], info_fits[n_win] = self._fit_data(
+                    u_te[starts[n_win]:ends[n_win]],
+                    i_te[starts[n_win]:ends[n_win]],
+                    u_range, fit_method=fit_method)
+        if progress is not None:
+            progress(n_windows, n_windows)
+
+        results.t[filled] = windows['time_means'][:n_windows][filled]
+        results.te[filled] = te_fits[:n_windows][filled]
+        results.info[filled] = info_fits[:n_windows][filled]
+        if self.fit_status is not None:
+            results.status[:] = self.fit_status[:n_windows]
+        else:
+            results.status[:] = np.where(results.te > 0, FIT_CONVERGED,
+                                         FIT_FAILED)
+
+        # Current-Voltage Plot data: sample ranges and fit of windows
+        cv_windows = np.zeros(n_windows, dtype=CV_WINDOW_DTYPE)
+        cv_windows['start'], cv_windows['end'] = starts, ends
+        cv_windows['k'], cv_windows['c'] = results.k, results.c
+        cv_windows['time_mean'] = results.t
+        cv_plot_data = CVPlotData(u_te, i_te, cv_windows, u_range)
+        return results, cv_plot_data, self.fit_status
 
     def _calc_spans(self, dt_range_te=None, sweep_direction='up',
-                   dt_range_ne=(2,2)):
-        """ Calculate spans for te and ne using SpanDetector """
-        self.spandet = SpanDetector(self.t, self.u, self.i)
-        self.spans_te, self.spans_ne = self.spandet.spans(
-            dt_range_te=dt_range_te,
-            dt_range_ne=dt_range_ne,
-            sweep_direction=sweep_direction
-            )
-
-    def _add_results(self, res_t, res_te, res_ne, res_info, res):
+                   dt_range_ne=(2,2), **kwargs):
         """
-        Append results to data lists
-        if no results return zeros
+        Calculate spans for te and ne using SpanDetector
+
+        kwargs are passed to SpanDetector (precomputed u_smooth, u_mins).
+        Repere points of signals are found once, spans are cached by their
+        parameters.
         """
-        res_t.append(res[0])
-        res_te.append(res[1])
-        res_ne.append(res[2])
-        res_info.append(res[3])
+        if self.spandet is None:
+            self.spandet = SpanDetector(self.t, self.u, self.i, **kwargs)
+        key = (_key(dt_range_te), sweep_direction, _key(dt_range_ne))
+        self.spans_te, self.spans_ne = self._cached(
+            'spans', key, lambda: self.spandet.spans(
+                dt_range_te=dt_range_te,
+                dt_range_ne=dt_range_ne,
+                sweep_direction=sweep_direction
+                ))
 
     def _fit_data(self, u, i, u_range, fit_method='linear'):
         """ Filter data for fitting and use chosen method """
@@ -210,7 +437,149 @@ class TeNeAnalyzer():
 
         return 1.0/k, (k, c, kerr, cerr)
 
-    def _te_exponential_fit(self, u, i):
+    def _log_linear_fit_windows(self, n_avg, u_range, progress=None):
+        """
+        Linear fit of u, ln(i) of all sliding windows at once.
+
+        Sums for least squares (count, u, u^2, ln(i), u*ln(i), ln(i)^2) of
+        every window are calculated from prefix sums of masked samples, then
+        slopes and errors are found in closed form. Spans are summed in
+        FIT_PROGRESS_STEPS chunks, progress(done, total) is called with
+        amount of summed windows after every chunk if given.
+
+        Returns
+        -------
+        (n, k, c, kerr, cerr) : tuple(ndarray, ...)
+            Amount of fitted points and fit parameters of every window
+            (NaN if fit is not defined).
+        """
+        u, i = np.asarray(self.u_smoothed), np.asarray(self.i_smoothed)
+        # samples used in fit: positive current within voltage range
+        mask = i > 0
+        u_range_mask = self._u_range_mask(u, u_range)
+        if u_range_mask is not None:
+            mask &= u_range_mask
+        nan_mask = mask & np.isnan(u)
+        mask &= ~nan_mask
+
+        # values are shifted by their means to keep precision of sums
+        ln_i = np.log(i, out=np.zeros(len(i)), where=mask)
+        u0 = np.mean(u[mask]) if np.any(mask) else 0.0
+        y0 = np.mean(ln_i[mask]) if np.any(mask) else 0.0
+        x = np.where(mask, u - u0, 0.0)
+        y = np.where(mask, ln_i - y0, 0.0)
+
+        # sums of every span by chunks of spans, windows are found from
+        # sums of all spans, so results do not depend on chunks
+        spans = np.asarray(self.spans_te)
+        sums = np.zeros((7, len(spans)))
+        for chunk in chunk_slices(len(spans), FIT_PROGRESS_STEPS):
+            i0 = max(spans[chunk].min(), 0)
+            i1 = max(spans[chunk].max(), i0)
+            xc, yc = x[i0:i1], y[i0:i1]
+            for n_sum, values in enumerate((mask[i0:i1], xc, yc, xc*xc,
+                                            xc*yc, yc*yc, nan_mask[i0:i1])):
+                sums[n_sum, chunk] = span_sums(values, spans[chunk] - i0)
+            if progress is not None:
+                progress(max(chunk.stop - n_avg + 1, 0),
+                         max(len(spans) - n_avg + 1, 0))
+
+        n, *sums, n_nan = (sliding_sums(values, n_avg) for values in sums)
+        if np.any(n_nan):
+            raise ValueError("Входные данные содержат NaN!")
+        return (n, *linear_fit_sums(n, *sums, x0=u0, y0=y0))
+
+    def _te_linear_fit_windows(self, n_avg, u_range, progress=None):
+        """
+        Fit Current-Voltage plot of all sliding windows at once.
+
+        Gives the same results as _te_linear_fit for every window of n_avg
+        Te spans (see _log_linear_fit_windows, progress is passed to it).
+
+        Returns
+        -------
+        (te, info) : tuple(ndarray, ndarray)
+            Te of every window and (N, 4) array of k, c, kerr, cerr.
+        """
+        n, k, c, kerr, cerr = self._log_linear_fit_windows(n_avg, u_range,
+                                                           progress)
+        return self._te_info_windows(n > 1, k, c, kerr, cerr)
+
+    def _te_fit_windows_each(self, u_te, i_te, offsets_te, n_windows, n_avg,
+                             u_range, workers, progress=None):
+        """
+        Fit Current-Voltage plot of every window with _te_exponential_fit,
+        chunks of windows are fitted in worker processes. progress(done,
+        total) is called with amount of fitted windows after every chunk.
+
+        Returns
+        -------
+        (te, info) : tuple(ndarray, ndarray)
+            Te of every window and (N, 4) array of k, c, kerr, cerr.
+        """
+        windows = [self._u_mask(u_te[offsets_te[n]:offsets_te[n + n_avg]],
+                                i_te[offsets_te[n]:offsets_te[n + n_avg]],
+                                u_range) for n in range(n_windows)]
+        # a few chunks per worker to balance uneven fit times
+        slices = chunk_slices(n_windows, 4 * resolve_workers(workers))
+        chunk_progress = None
+        if progress is not None:
+            def chunk_progress(done, _total):
+                progress(slices[done - 1].stop, n_windows)
+        fits = [fit for chunk_fits in map_ordered(
+            _te_exponential_fit_chunk, [windows[chunk] for chunk in slices],
+            workers, executor='process', progress=chunk_progress)
+                for fit in chunk_fits]
+        te = np.array([fit[0] for fit in fits], dtype=np.float64)
+        info = np.array([fit[1] for fit in fits],
+                        dtype=np.float64).reshape(-1, 4)
+        return te, info
+
+    def _te_exponential_fit_windows(self, n_avg, u_range, workers=1,
+                                    progress=None):
+        """
+        Fit Current-Voltage plot of all sliding windows with exponent.
+
+        Same problem as _te_exponential_fit for every window, solved with
+        vectorised Levenberg-Marquardt (exp_fit_windows) seeded by log-linear
+        fit of the window. Fit status of every window is saved in
+        self.fit_status, progress is passed to exp_fit_windows.
+
+        Returns
+        -------
+        (te, info) : tuple(ndarray, ndarray)
+            Te of every window and (N, 4) array of k, c, kerr, cerr.
+        """
+        idx_te, offsets_te = span_indices(self.spans_te, len(self.t))
+        u_te = np.asarray(self.u_smoothed)[idx_te]
+        i_te = np.asarray(self.i_smoothed)[idx_te]
+        mask = self._u_range_mask(u_te, u_range)
+        if mask is None:
+            mask = np.ones(len(u_te), dtype=bool)
+        if np.any(np.isnan(u_te[mask])) or np.any(np.isnan(i_te[mask])):
+            raise ValueError("Входные данные содержат NaN!")
+        # offsets of spans in masked samples
+        csum_mask = np.concatenate(([0], np.cumsum(mask)))
+
+        _, k0, c0, _, _ = self._log_linear_fit_windows(n_avg, u_range)
+        k, c, kerr, cerr, status = exp_fit_windows(
+            u_te[mask], i_te[mask], csum_mask[offsets_te], n_avg, k0, c0,
+            bounds=EXP_FIT_BOUNDS, workers=workers, progress=progress)
+        self.fit_status = status
+        return self._te_info_windows(status != FIT_FAILED, k, c, kerr, cerr)
+
+    def _te_info_windows(self, valid, k, c, kerr, cerr):
+        """ Te and info of windows, zeros if not valid or k not positive """
+        with np.errstate(invalid='ignore'):
+            valid = valid & (k > 0) & ~np.isclose(k, 0)
+        te = np.zeros(len(k))
+        te[valid] = 1.0 / k[valid]
+        info = np.zeros((len(k), 4))
+        info[valid] = np.column_stack((k, c, kerr, cerr))[valid]
+        return te, info
+
+    @staticmethod
+    def _te_exponential_fit(u, i):
         """ fit Current-Voltage plot with np.exp """
         if len(u) <= 1 or len(i) <= 1:
             return 0, (0, 0, 0, 0)
@@ -225,12 +594,20 @@ class TeNeAnalyzer():
 
         return 1.0/k, (k, c, kerr, cerr)
 
-    def _u_mask(self, u, i, u_range):
-        """ Mask voltage and current values by given voltage range """
+    @staticmethod
+    def _u_range_mask(u, u_range):
+        """ Boolean mask of voltage within range or None if no range """
         if u_range is None or u_range[0] == 0 and u_range[1] == 0:
+            return None
+        return (u_range[0] < u) & (u < u_range[1])
+
+    @staticmethod
+    def _u_mask(u, i, u_range):
+        """ Mask voltage and current values by given voltage range """
+        mask = TeNeAnalyzer._u_range_mask(u, u_range)
+        if mask is None:
             return u, i
 
-        mask = (u_range[0] < u) & (u < u_range[1])
         u = u[mask]
         i = i[mask]
         return u, i
@@ -248,11 +625,156 @@ class TeNeAnalyzer():
 
         return ne
 
+    @staticmethod
+    def _ne_windows(te, i_is, probe_area, m_i):
+        """ ne of all windows at once, same as _ne_formula for every window """
+        ne = np.zeros(len(te))
+        if not is_valid_positive(probe_area):
+            return ne
+        with np.errstate(divide='ignore', invalid='ignore'):
+            valid = (te > 0) & ~np.isclose(te, 0)
+            ne[valid] = (1.12 * (i_is[valid] / probe_area)
+                         * np.sqrt(m_i / te[valid]))
+            ne[~((ne > 0) & ~np.isclose(ne, 0))] = 0.0
+        return ne
+
+    def span_times(self):
+        """
+        Mean time of every Te span (NaN for empty span).
+
+        Calculated once for spans_te, nearest span is found by binary
+        search (see find_nearest_info).
+        """
+        if self._span_times[0] is not self.spans_te:
+            offsets = span_offsets(self.spans_te, len(self.t))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                times = window_sums(self.t, self.spans_te) / np.diff(offsets)
+            valid = np.flatnonzero(np.isfinite(times))
+            self._span_times = (self.spans_te, valid, times)
+        return self._span_times[2]
+
     def find_nearest_info(self, t):
         """ find nearest span in spans_te by time value """
         if t is None:
             return
-        span_times = [self.t[span[0]:span[1]].mean() for span in self.spans_te]
-        dt = np.abs(span_times - t)
-        i = np.nanargmin(dt)
-        return i
+        times = self.span_times()
+        valid = self._span_times[1]
+        return valid[nearest_index(times[valid], t)]
+
+
+#%% Results of windows
+def _column(name):
+    """ Property of TeNeResults column by name """
+    n = RESULT_COLUMNS.index(name)
+    return property(lambda self: self.data[n], doc=f"{name} of windows")
+
+
+class TeNeResults():
+    """
+    Results of windows in contiguous float64 columns of one array.
+
+    Columns (see RESULT_COLUMNS) are rows of (9, N) array data: time, Te,
+    ne, fit parameters k, c, kerr, cerr, amount of samples of window and
+    fit status (FIT_CONVERGED, FIT_MAX_ITER or FIT_FAILED). Length of
+    results is amount of windows N. Results are unpacked as
+    (res_t, res_te, res_ne, res_info), all items are views of data,
+    res_info is (N, 4) transposed (not contiguous) view of k, c, kerr, cerr.
+
+    Parameters
+    ----------
+    data : ndarray or int, optional
+        (9, N) array of columns or amount of windows N for zero columns.
+        The default is 0.
+
+    Example:
+        results = tna.calc_te_ne(parameters)
+        res_t, te, ne, info = results
+        te_err = results.kerr / results.k**2
+    """
+    __slots__ = ('data',)
+    t = _column('t')
+    te = _column('te')
+    ne = _column('ne')
+    k = _column('k')
+    c = _column('c')
+    kerr = _column('kerr')
+    cerr = _column('cerr')
+    n_samples = _column('n_samples')
+    status = _column('status')
+
+    def __init__(self, data=0):
+        if np.ndim(data) == 0:
+            data = np.zeros((len(RESULT_COLUMNS), int(data)))
+        self.data = data
+
+    @property
+    def info(self):
+        """
+        (N, 4) transposed view of fit parameters k, c, kerr, cerr, it is
+        not contiguous (np.ascontiguousarray copies it).
+        """
+        return self.data[3:7].T
+
+    def __len__(self):
+        return self.data.shape[1]
+
+    def __iter__(self):
+        return iter((self.t, self.te, self.ne, self.info))
+
+    def copy(self):
+        """ Results with copy of data """
+        return TeNeResults(self.data.copy())
+
+    @classmethod
+    def concatenate(cls, results):
+        """ Results of all windows of given results (e.g. of iter_te_ne) """
+        return cls(np.concatenate([res.data for res in results], axis=1))
+
+
+#%% Current-Voltage Plot data
+class CVPlotData():
+    """
+    Current-Voltage Plot data of windows, samples are taken on request.
+
+    Every window is a range of samples of all Te spans and its fit, so
+    memory does not depend on n_avg and window samples are not copied.
+
+    Parameters
+    ----------
+    u, i : ndarray
+        Voltage and current samples of all Te spans.
+    windows : ndarray
+        Structured array of CV_WINDOW_DTYPE: start, end, k, c, time_mean.
+    u_range : tuple(float, float)
+        Voltage range of fit.
+
+    Example:
+        u_wide, i_wide, u, i, k, c, time_mean = tna.cv_plot_data[n]
+    """
+    def __init__(self, u, i, windows, u_range):
+        self.u, self.i, self.windows, self.u_range = u, i, windows, u_range
+
+    def __len__(self):
+        return len(self.windows)
+
+    def __iter__(self):
+        return (self[n] for n in range(len(self)))
+
+    def __getitem__(self, n):
+        """
+        Data of n-th window: (u_wide, i_wide, u, i, k, c, time_mean), where
+        u, i are masked by u_range, or ([], [], [], [], 0, 0) if empty.
+        """
+        start, end, k, c, time_mean = self.windows[n].tolist()
+        if end <= start:
+            return ([], [], [], [], 0, 0)
+        u_wide, i_wide = self.u[start:end], self.i[start:end]
+        # pylint: disable=protected-access
+        u, i = TeNeAnalyzer._u_mask(u_wide, i_wide, self.u_range)
+        return (u_wide, i_wide, u, i, k, c, time_mean)
+
+
+def _te_exponential_fit_chunk(windows):
+    """ Exponential fits of (u, i) windows, runs in worker process """
+    # pylint: disable=protected-access
+    return [TeNeAnalyzer._te_exponential_fit(u, i) for u, i in windows]
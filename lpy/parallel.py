@@ -0,0 +1,85 @@
+"""
+Module contains helpers for parallel execution with deterministic order
+
+Author: Ammosov
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+EXECUTORS = {
+    # NumPy/SciPy sections which release the GIL (smoothing, fft, sums)
+    'thread': ThreadPoolExecutor,
+    # pure Python sections (e.g. curve_fit of every window)
+    'process': ProcessPoolExecutor,
+}
+
+
+def resolve_workers(workers=1):
+    """
+    Amount of workers from workers knob.
+
+    None or 1 is serial execution, negative values count from CPU count
+    as in scipy (-1 is all CPUs, -2 is all but one).
+    """
+    if workers is None:
+        return 1
+    workers = int(workers)
+    if workers < 0:
+        workers += (os.cpu_count() or 1) + 1
+    return max(workers, 1)
+
+
+def map_ordered(func, items, workers=1, executor='thread', progress=None):
+    """
+    Applies func to every item, in parallel if workers allow.
+
+    Parameters
+    ----------
+    func : callable
+        Function of one item (picklable for 'process' executor).
+    items : iterable
+        Items to process.
+    workers : int, optional
+        Amount of workers (see resolve_workers). The default is 1.
+    executor : str, optional
+        'thread' or 'process' pool. The default is 'thread'.
+    progress : callable, optional
+        progress(done, total) is called after every item in items order.
+        It may raise an exception to stop, items not started are dropped.
+        The default is None.
+
+    Returns
+    -------
+    list
+        Results in items order, the same as of serial execution.
+    """
+    items = list(items)
+    workers = min(resolve_workers(workers), len(items))
+    results = []
+    if workers <= 1:
+        for item in items:
+            results.append(func(item))
+            if progress is not None:
+                progress(len(results), len(items))
+        return results
+    with EXECUTORS[executor](max_workers=workers) as pool:
+        futures = [pool.submit(func, item) for item in items]
+        try:
+            for future in futures:
+                results.append(future.result())
+                if progress is not None:
+                    progress(len(results), len(items))
+        finally:
+            # nothing is left to run after error or stop
+            for future in futures:
+                future.cancel()
+    return results
+
+
+def chunk_slices(size, n_chunks):
+    """ Splits range(size) into at most n_chunks contiguous slices """
+    n_chunks = max(min(n_chunks, size), 1)
+    bounds = [size * n // n_chunks for n in range(n_chunks + 1)]
+    return [slice(i0, i1) for i0, i1 in zip(bounds[:-1], bounds[1:])
+            if i1 > i0]
@@ -4,6 +4,7 @@ Module contains functions for processing data filterring and smoothing
 Author: Ammosov
 """
 
+from functools import lru_cache
 import numpy as np
 import numpy.typing as npt
 from scipy.signal import fftconvolve
@@ -46,9 +47,84 @@ def exp(x: npt.ArrayLike, k: float, c: float) -> npt.NDArray[np.float64]:
     return np.exp(k*x + c)
 
 
-def smooth(x, avg, n=1):
+def _box_cumsum(x, avg):
     """
-    Smoothes array values using scipy fftconvolve.
+    One box filter pass in O(n) using running sum.
+
+    Reproduces fftconvolve(x, np.ones(avg)/avg, mode='same') including
+    zero padded edges: output k is sum of x[k+s-avg+1 : k+s+1] / avg,
+    where s = (avg-1)//2 and x is zero outside of its range.
+    """
+    size, shift = len(x), (avg - 1) // 2
+    # running sum padded with zeros on the left, last value on the right
+    csum = np.zeros(size + avg)
+    np.cumsum(x, out=csum[avg-shift:avg-shift+size])
+    csum[avg-shift+size:] = csum[avg-shift+size-1]
+    return (csum[avg:] - csum[:size]) / avg
+
+
+def _smooth_cumsum(x, avg, n):
+    """ Applies n+1 running sum box filter passes """
+    x_smooth = np.asarray(x, dtype=np.float64)
+    for _ in range(n+1):
+        x_smooth = _box_cumsum(x_smooth, avg)
+    return x_smooth
+
+
+@lru_cache(maxsize=32)
+def _smooth_kernel(avg, n):
+    """ Precomputed kernel equal to n+1 box kernels convolved together """
+    box = np.ones(avg)/avg
+    kernel = box
+    for _ in range(n):
+        kernel = np.convolve(kernel, box)
+    kernel.setflags(write=False)
+    return kernel
+
+
+def _smooth_kernel_fft(x, avg, n):
+    """
+    Applies n+1 box filters as one fftconvolve with collapsed kernel.
+
+    Edges are truncated after every pass in iterative smoothing, so first
+    and last (n+1)*(avg-1) values are recalculated with running sum passes.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    size, edge = len(x), (n+1)*(avg-1)
+    if size <= 2*edge:
+        return _smooth_cumsum(x, avg, n)
+
+    shift = (n+1)*((avg-1)//2)
+    x_smooth = fftconvolve(x, _smooth_kernel(avg, n), mode='full')
+    x_smooth = x_smooth[shift:shift+size]
+    x_smooth[:edge] = _smooth_cumsum(x[:2*edge], avg, n)[:edge]
+    x_smooth[size-edge:] = _smooth_cumsum(x[size-2*edge:], avg, n)[edge:]
+    return x_smooth
+
+
+def _smooth_fft(x, avg, n):
+    """ Applies n+1 box filters with scipy fftconvolve (reference) """
+    x_smooth = x
+    box = np.ones(avg)/avg
+    for _ in range(n+1):
+        x_smooth = fftconvolve(x_smooth, box, mode='same')
+    return x_smooth
+
+
+SMOOTH_ENGINES = {
+    'cumsum': _smooth_cumsum,
+    'kernel': _smooth_kernel_fft,
+    'fft': _smooth_fft,
+}
+# passes count from which collapsed kernel is faster than running sums
+SMOOTH_KERNEL_PASSES = 16
+
+
+def smooth(x, avg, n=1, engine='auto'):
+    """
+    Smoothes array values by box filter (moving average) applied n+1 times.
+
+    Result equals iterative scipy fftconvolve with mode='same'.
     Parameters
     ----------
     x : array like
@@ -57,6 +133,12 @@ def smooth(x, avg, n=1):
         Defines window box size.
     n : int, optional
         Amount of iterations to apply smoothing. The default is 1.
+    engine : str, optional
+        Smoothing implementation:
+        - "auto": chosen by amount of passes (default)
+        - "cumsum": O(len(x)) running sum for every pass
+        - "kernel": one fftconvolve with precomputed collapsed kernel
+        - "fft": fftconvolve for every pass (reference)
 
     Returns
     -------
@@ -65,12 +147,81 @@ def smooth(x, avg, n=1):
     """
     if len(x) == 1:
         return x
+    if len(x) == 0 or avg == 1:
+        # box of size 1 does not change values
+        return np.asarray(x, dtype=np.float64).copy()
 
-    x_smooth = x
-    for _ in range(n+1):
-        box = np.ones(avg)/avg
-        x_smooth = fftconvolve(x_smooth, box, mode='same')
-    return x_smooth
+    if engine == 'auto':
+        engine = 'kernel' if n+1 >= SMOOTH_KERNEL_PASSES else 'cumsum'
+    return SMOOTH_ENGINES[engine](x, avg, n)
+
+
+def smooth_margin(avg, n=1):
+    """
+    Amount of samples at each side which affect smoothed values.
+
+    smooth(x)[k] depends on x values no farther than smooth_margin(avg, n)
+    from k, so a slice with such margins is enough to smooth a part of x.
+    """
+    return (n+1)*(avg-1)
+
+
+def smooth_range(x, i0, i1, avg, n=1):
+    """
+    Smoothes part x[i0:i1] of array as a part of smooth(x, avg, n).
+
+    Only x[i0-margin:i1+margin] (see smooth_margin) is read and smoothed,
+    so long (e.g. memory-mapped) signals are processed by parts.
+
+    Parameters
+    ----------
+    x : array like
+        Input values.
+    i0, i1 : int
+        Start and end (not included) indices of part to smooth.
+    avg : int
+        Defines window box size.
+    n : int, optional
+        Amount of iterations to apply smoothing. The default is 1.
+
+    Returns
+    -------
+    ndarray
+        Smoothed values equal to smooth(x, avg, n)[i0:i1].
+    """
+    i0, i1 = max(i0, 0), min(i1, len(x))
+    margin = smooth_margin(avg, n)
+    j0, j1 = max(i0 - margin, 0), min(i1 + margin, len(x))
+    x_smooth = smooth(np.asarray(x[j0:j1], dtype=np.float64), avg, n)
+    return x_smooth[i0-j0:i1-j0]
+
+
+def nearest_index(x, value):
+    """
+    Index of value of sorted array x nearest to given value.
+
+    Binary search (np.searchsorted), the lowest index is returned for equal
+    distances (as np.argmin of distances).
+
+    Parameters
+    ----------
+    x : array like
+        Sorted values without NaN.
+    value : float
+        Value to find.
+
+    Returns
+    -------
+    int
+        Index of nearest value.
+    """
+    if len(x) == 0:
+        raise ValueError("Пустой массив для поиска")
+    i = int(np.searchsorted(x, value))
+    if i == len(x) or (i > 0 and value - x[i-1] <= x[i] - value):
+        # first of equal values
+        return int(np.searchsorted(x, x[i-1]))
+    return i
 
 
 def detect_peaks_iqr(data, q1=25, q3=75):
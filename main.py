@@ -8,11 +8,14 @@ Main file to launch program with GUI
 """
 
 import sys
+import multiprocessing
 from PyQt5.QtWidgets import QApplication
 from gui import MainWindow
 
 
 if __name__ == "__main__":
+    # process pool workers of frozen executable must not start GUI
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
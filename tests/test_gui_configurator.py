@@ -147,7 +147,7 @@ def test_ok_button_pushed(qtbot, configurator, mocker):
         },
     }
 
-    mock_load.assert_called_once_with(None, expected_cfg)
+    mock_load.assert_called_once_with(None, expected_cfg, cache=mocker.ANY)
 
 if __name__ == '__main__':
     pytest.main(['test_gui_configurator.py'])
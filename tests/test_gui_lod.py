@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Testing level of detail decimation of signals
+"""
+
+import pytest
+import numpy as np
+from matplotlib.figure import Figure
+from gui.lod import MinMaxPyramid, LodLine
+
+
+@pytest.fixture
+def _signal():
+    """ Noisy signal with single sample peaks """
+    rng = np.random.default_rng(0)
+    t = np.arange(100_003) * 1e-3
+    y = rng.normal(size=len(t))
+    y[12_345], y[70_001] = 50, -60
+    return t, y
+
+
+def test_decimate_peaks(_signal):
+    """ Test decimated signal keeps extrema of every range """
+    t, y = _signal
+    pyramid = MinMaxPyramid(t, y)
+    for x0, x1 in [(t[0], t[-1]), (12.0, 12.5), (0.5, 70.2), (99.9, 200)]:
+        t_dec, y_dec = pyramid.decimate(x0, x1, 100)
+        mask = (t >= x0) & (t <= x1)
+        assert len(t_dec) <= 2 * 100 * pyramid.factor + 2 * pyramid.factor
+        assert np.all(np.diff(t_dec) > 0)
+        assert y_dec.max() >= y[mask].max()
+        assert y_dec.min() <= y[mask].min()
+        # samples are original ones
+        assert np.array_equal(y[np.searchsorted(t, t_dec)], y_dec)
+
+
+def test_decimate_full_resolution(_signal):
+    """ Test original samples are returned when zoomed in """
+    t, y = _signal
+    pyramid = MinMaxPyramid(t, y)
+    t_dec, y_dec = pyramid.decimate(t[500], t[600], 100)
+    assert np.array_equal(t_dec, t[499:602])
+    assert np.array_equal(y_dec, y[499:602])
+    # short and empty signals
+    assert len(MinMaxPyramid(t[:3], y[:3]).decimate(0, 1, 1)[0]) == 3
+    assert len(MinMaxPyramid(t[:0], y[:0]).decimate(0, 1, 1)[0]) == 0
+
+
+def test_lod_line(_signal):
+    """ Test line is re-decimated on xlim change """
+    t, y = _signal
+    ax = Figure().subplots()
+    lod_line = LodLine(ax, MinMaxPyramid(t, y), label='y')
+    ax.callbacks.connect('xlim_changed', lod_line.update)
+    assert len(lod_line.line.get_xdata()) < len(t) / 10
+    ax.set_xlim(t[500], t[600])
+    assert np.array_equal(lod_line.line.get_xdata(), t[499:602])
+    # signal is replaced in the same line artist
+    line = lod_line.line
+    lod_line.set_pyramid(MinMaxPyramid(t, -y))
+    assert lod_line.line is line
+    assert np.array_equal(line.get_ydata(), -y[499:602])
+
+
+if __name__ == "__main__":
+    pytest.main(["test_gui_lod.py"])
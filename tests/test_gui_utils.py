@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Testing gui utils functions
+"""
+
+import pytest
+import numpy as np
+from matplotlib.figure import Figure
+from gui.utils import span_verts, add_span_collection, memo_get, memo_put
+
+
+def test_span_collection():
+    """ Test spans are drawn as one collection of axvspan rectangles """
+    t = np.arange(10) * 0.5
+    spans = np.array([[1, 3], [5, 10]])
+    verts = span_verts(t, spans)
+    assert verts.shape == (2, 4, 2)
+    assert np.array_equal(verts[0], [[0.5, 0], [0.5, 1], [1.5, 1], [1.5, 0]])
+    # end index is clipped to signal length
+    assert np.array_equal(verts[1, :, 0], [2.5, 2.5, 4.5, 4.5])
+    assert span_verts(t, np.zeros((0, 2))).shape == (0, 4, 2)
+
+    ax = Figure().subplots()
+    ax.plot(t, t)
+    ylim = ax.get_ylim()
+    collection = add_span_collection(ax, verts, color='green', alpha=0.2)
+    assert list(ax.collections) == [collection]
+    assert ax.get_ylim() == ylim
+    # rectangle in display coordinates as of axvspan
+    patch = ax.axvspan(t[1], t[3])
+    xy = collection.get_transform().transform(verts[0])
+    xy_patch = patch.get_verts()
+    assert np.allclose(xy.min(axis=0), xy_patch.min(axis=0))
+    assert np.allclose(xy.max(axis=0), xy_patch.max(axis=0))
+
+
+def test_memo():
+    """ Test values memoised by objects, the oldest are dropped """
+    memo = {}
+    objs = [np.zeros(n) for n in range(3)]
+    assert memo_get(memo, objs[0], lambda: 'new') == 'new'
+    assert not memo
+    for n, obj in enumerate(objs):
+        assert memo_put(memo, obj, n, size=2) == n
+    assert memo_get(memo, objs[0], lambda: 'new') == 'new'
+    assert memo_get(memo, objs[2], lambda: 'new') == 2
+    assert [entry[0] for entry in memo.values()] == objs[1:]
+
+if __name__ == "__main__":
+    pytest.main(["test_gui_utils.py"])
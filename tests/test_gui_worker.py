@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Testing background analysis worker
+"""
+
+import pytest
+from gui.worker import AnalysisWorker, WorkerSignals
+
+
+@pytest.fixture
+def signals(qtbot):
+    """ Shared worker signals with recorded emissions """
+    # pylint: disable=unused-argument
+    signals = WorkerSignals()
+    emitted = {'progress': [], 'finished': [], 'error': []}
+    signals.progress.connect(lambda *args: emitted['progress'].append(args))
+    signals.finished.connect(lambda *args: emitted['finished'].append(args))
+    signals.error.connect(lambda *args: emitted['error'].append(args))
+    return signals, emitted
+
+
+def _calc(n, progress=None):
+    """ Calculation with progress callback """
+    for done in range(n):
+        progress(done, n)
+    return n * 2
+
+
+def test_worker_finished(signals):
+    """ Test current job sends progress and result """
+    signals, emitted = signals
+    AnalysisWorker(signals, 1, lambda gen: True, _calc, 3).run()
+    assert emitted['progress'] == [(1, 0, 3), (1, 1, 3), (1, 2, 3)]
+    assert emitted['finished'] == [(1, 6)]
+    assert not emitted['error']
+
+
+def test_worker_progress_throttled(signals):
+    """ Test progress is sent only when its percentage changes """
+    signals, emitted = signals
+    AnalysisWorker(signals, 2, lambda gen: True, _calc, 1000).run()
+    assert len(emitted['progress']) == 100
+    assert emitted['progress'][:2] == [(2, 0, 1000), (2, 10, 1000)]
+
+
+def test_worker_cancelled(signals):
+    """ Test stale job is cancelled and sends nothing """
+    signals, emitted = signals
+    checks = []
+    # job is superseded after start and first window
+    def is_current(gen):
+        checks.append(gen)
+        return len(checks) <= 2
+
+    AnalysisWorker(signals, 1, is_current, _calc, 3).run()
+    assert emitted['progress'] == [(1, 0, 3)]
+    assert not emitted['finished'] and not emitted['error']
+
+    AnalysisWorker(signals, 1, is_current, _calc, 3).run()
+    assert emitted['progress'] == [(1, 0, 3)]
+
+
+def test_worker_error(signals):
+    """ Test exception of calculation is sent as error """
+    signals, emitted = signals
+    AnalysisWorker(signals, 5, lambda gen: True, _calc, None).run()
+    assert not emitted['finished']
+    assert emitted['error'][0][0] == 5
+    assert 'TypeError' in emitted['error'][0][1]
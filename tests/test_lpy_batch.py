@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Testing batch module
+"""
+import shutil
+import yaml
+import pytest
+import numpy as np
+from lpy import load, run_batch, TeNeAnalyzer
+from lpy.batch import main
+
+
+@pytest.fixture
+def _shots_dir(tmp_path):
+    """ Directory with copies of shot 3008 and its config """
+    with open("test_data/3008.yml", encoding='utf-8') as stream:
+        cfg = yaml.safe_load(stream)
+    shots_dir = tmp_path / "shots"
+    shots_dir.mkdir()
+    for shot in (3001, 3002):
+        shutil.copy(cfg['tdms_path'], shots_dir / f"T15MD_{shot}.tdms")
+    return cfg, shots_dir
+
+
+def test_run_batch(_shots_dir, tmp_path):
+    """ Test batch results against TeNeAnalyzer and failure isolation """
+    cfg, shots_dir = _shots_dir
+    parameters = {'n_avg': 3, 'u_range': (0, 15)}
+    out_dir = tmp_path / "out"
+    logs = []
+
+    summaries = run_batch([shots_dir, tmp_path / "T15MD_1.tdms"],
+                          cfg['signals'], probes=['LP.13'],
+                          parameters=parameters, out_dir=out_dir,
+                          workers=2, log=logs.append)
+
+    assert len(summaries) == 3
+    failed = [summary for summary in summaries if summary['error']]
+    assert len(failed) == 1 and failed[0]['shot'] == 1
+    assert any('ERROR' in line for line in logs)
+
+    signals = load("test_data/3008.yml")
+    tna = TeNeAnalyzer(signals['time'], signals['LP.Power'], signals['LP.13'])
+    res_t, te, ne, _ = tna.calc_te_ne(parameters)
+    for shot in (3001, 3002):
+        data = np.loadtxt(out_dir / f"{shot}_LP.13_Te_ne.txt")
+        assert np.allclose(data.T[0], res_t, atol=1e-3)
+        assert np.allclose(data.T[1], te, atol=1e-3)
+        assert np.allclose(data.T[2], ne, atol=1e-3)
+
+
+def test_main(_shots_dir, tmp_path):
+    """ Test command line entry point """
+    _, shots_dir = _shots_dir
+    out_dir = tmp_path / "out"
+    params_path = tmp_path / "params.yml"
+    params_path.write_text("n_avg: 3\nu_range: [0, 15]\n", encoding='utf-8')
+
+    code = main(['batch', "test_data/3008.yml", str(shots_dir),
+                 '--params', str(params_path), '--out', str(out_dir),
+                 '--workers', '1'])
+    assert code == 0
+    assert len(list(out_dir.glob("*_Te_ne.txt"))) == 4
+
+    # case failed shot gives non zero exit code
+    code = main(['batch', "test_data/3008.yml", str(tmp_path / "none.tdms"),
+                 '--out', str(out_dir)])
+    assert code == 1
+
+
+if __name__ == "__main__":
+    pytest.main(["test_lpy_batch.py"])
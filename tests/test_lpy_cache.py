@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Testing cache module
+"""
+import pytest
+import numpy as np
+from lpy import load, ShotCache
+
+
+def test_put_get(tmp_path):
+    """ Test storing signals and reading them memory-mapped """
+    cache = ShotCache(tmp_path)
+    signals = {'shot': 3008, 'time': np.linspace(0, 1, 100),
+               'LP.Power': np.arange(100.0)}
+
+    assert cache.get('key') is None
+    cache.put('key', signals)
+    signals_cached = cache.get('key')
+
+    assert signals_cached['shot'] == 3008
+    assert isinstance(signals_cached['time'], np.memmap)
+    assert np.array_equal(signals_cached['time'], signals['time'])
+    assert np.array_equal(signals_cached['LP.Power'], signals['LP.Power'])
+
+
+def test_evict_and_clear(tmp_path):
+    """ Test LRU eviction by max_size and clearing cache """
+    # every entry is a bit more than 8000 bytes
+    cache = ShotCache(tmp_path, max_size=20000)
+    signals = {'shot': 0, 'time': np.zeros(1000)}
+
+    cache.put('key1', signals)
+    cache.put('key2', signals)
+    assert len(cache.entries()) == 2
+
+    # case 1 least recently used entry is evicted
+    cache.get('key1')
+    cache.put('key3', signals)
+    assert cache.get('key2') is None
+    assert cache.get('key1') is not None
+    assert cache.get('key3') is not None
+    assert cache.size() <= cache.max_size
+
+    # case 2 clear
+    cache.clear()
+    assert cache.size() == 0
+    assert cache.get('key1') is None
+
+
+def test_orphaned_entry(tmp_path):
+    """ Test entry without meta file (partially deleted) is replaced """
+    cache = ShotCache(tmp_path)
+    signals = {'shot': 0, 'time': np.zeros(1000)}
+    cache.put('key1', signals)
+    cache.put('key2', signals)
+    (tmp_path / 'key1' / 'meta.yml').unlink()
+    (tmp_path / 'key2' / 'meta.yml').unlink()
+
+    # case orphaned entries are counted as least recently used
+    assert cache.get('key1') is None
+    assert [entry[0] for entry in cache.entries()] == [0, 0]
+    assert cache.size() > 0
+
+    # case orphaned entry is stored again, another one is evicted
+    cache.put('key1', signals)
+    assert np.array_equal(cache.get('key1')['time'], signals['time'])
+    assert [entry[2].name for entry in cache.entries()] == ['key1']
+
+    # case load again after meta file is deleted
+    signals = load("test_data/3008.yml", cache=cache)
+    key = max(cache.entries())[2]
+    (key / 'meta.yml').unlink()
+    signals_stored = load("test_data/3008.yml", cache=cache)
+    signals_cached = load("test_data/3008.yml", cache=cache)
+    assert isinstance(signals_cached['LP.09'], np.memmap)
+    for name, value in signals.items():
+        assert np.array_equal(signals_stored[name], value)
+        assert np.array_equal(signals_cached[name], value)
+
+
+def test_load_cache(tmp_path):
+    """ Test load function with cache gives the same signals """
+    cache = ShotCache(tmp_path)
+    signals = load("test_data/3008.yml")
+    signals_stored = load("test_data/3008.yml", cache=cache)
+    signals_cached = load("test_data/3008.yml", cache=cache)
+
+    assert len(cache.entries()) == 1
+    assert isinstance(signals_cached['LP.09'], np.memmap)
+    for key, value in signals.items():
+        assert np.array_equal(signals_stored[key], value)
+        assert np.array_equal(signals_cached[key], value)
+
+    # case another time window is another entry
+    load("test_data/3008.yml", t_range=(0, 100), cache=cache)
+    assert len(cache.entries()) == 2
+
+
+if __name__ == "__main__":
+    pytest.main(["test_lpy_cache.py"])
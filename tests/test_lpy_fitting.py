@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Testing fitting module
+"""
+import pytest
+import numpy as np
+from scipy.stats import linregress
+from lpy import fitting
+from lpy.fitting import (span_indices, span_offsets, span_sums, sliding_sums,
+                         window_sums, linear_fit_sums, exp_fit_windows, FIT_CONVERGED,
+                         FIT_FAILED)
+
+
+def test_span_indices():
+    """ Test windows gathered by indices against concatenated slices """
+    values = np.arange(100.0) ** 2
+    # spans with empty, reversed and out of range ones
+    spans = np.array([[0, 5], [10, 10], [20, 17], [30, 42], [95, 120]])
+    indices, offsets = span_indices(spans, len(values))
+    values_spans = values[indices]
+
+    for n_avg in (1, 2, 3):
+        for n in range(len(spans) - n_avg + 1):
+            expected = np.concatenate([values[i0:i1] for i0, i1
+                                       in spans[n:n + n_avg]])
+            window = values_spans[offsets[n]:offsets[n + n_avg]]
+            assert np.array_equal(window, expected)
+
+
+def test_window_sums():
+    """ Test sums over windows of spans """
+    values = np.arange(10.0)
+    spans = np.array([[0, 2], [2, 5], [5, 5], [7, 10]])
+
+    assert np.array_equal(window_sums(values, spans), [1, 9, 0, 24])
+    assert np.array_equal(window_sums(values, spans, n_avg=2), [10, 9, 24])
+    assert np.array_equal(window_sums(values, spans, n_avg=4), [34])
+    assert len(window_sums(values, spans, n_avg=5)) == 0
+    # window sums are sliding sums of span sums
+    assert np.array_equal(span_sums(values, spans), [1, 9, 0, 24])
+    assert np.array_equal(sliding_sums([1, 9, 0, 24], 3), [10, 33])
+
+
+def test_linear_fit_sums():
+    """ Test fit from sums against scipy linregress """
+    rng = np.random.default_rng(0)
+    x = np.linspace(-40, 5, 50)
+    y = 0.2 * x + 3 + rng.normal(0, 0.1, len(x))
+    spans = np.array([[0, 20], [20, 21], [21, 50]])
+
+    n = window_sums(np.ones(len(x)), spans)
+    sums = [window_sums(values, spans) for values in (x, y, x*x, x*y, y*y)]
+    k, c, kerr, cerr = linear_fit_sums(n, *sums)
+
+    for n_win in (0, 2):
+        res = linregress(x[slice(*spans[n_win])], y[slice(*spans[n_win])])
+        assert np.allclose([k[n_win], c[n_win], kerr[n_win], cerr[n_win]],
+                           [res.slope, res.intercept,
+                            res.stderr, res.intercept_stderr])
+    # case window with one point
+    assert np.isnan(k[1]) and np.isnan(cerr[1])
+
+
+def test_exp_fit_windows(monkeypatch):
+    """ Test exponential fit of windows and independence of batches """
+    rng = np.random.default_rng(0)
+    spans = np.array([[0, 300], [300, 301], [301, 700], [700, 1000]])
+    x = rng.uniform(-40, 5, 1000)
+    k_true = np.repeat([0.2, 1.0, 0.3, 0.5], np.diff(spans).ravel())
+    c_true = np.repeat([1.0, 1.0, 2.0, 3.0], np.diff(spans).ravel())
+    y = np.exp(k_true * x + c_true) * (1 + rng.normal(0, 0.01, len(x)))
+    offsets = span_offsets(spans, len(x))
+
+    k, c, kerr, cerr, status = exp_fit_windows(x, y, offsets)
+    assert np.array_equal(status, [FIT_CONVERGED, FIT_FAILED,
+                                   FIT_CONVERGED, FIT_CONVERGED])
+    assert np.allclose(k[[0, 2, 3]], [0.2, 0.3, 0.5], rtol=1e-2)
+    assert np.allclose(c[[0, 2, 3]], [1.0, 2.0, 3.0], rtol=1e-2)
+    assert np.all(kerr[[0, 2, 3]] > 0) and np.all(cerr[[0, 2, 3]] > 0)
+
+    # case windows of 2 spans, the same results if every window is a batch
+    res = exp_fit_windows(x, y, offsets, n_avg=2, k0=0.5, c0=2.0)
+    monkeypatch.setattr(fitting, 'FIT_BATCH_SAMPLES', 1)
+    res_batched = exp_fit_windows(x, y, offsets, n_avg=2, k0=0.5, c0=2.0)
+    for values, values_batched in zip(res, res_batched):
+        assert len(values) == 3
+        assert np.array_equal(values, values_batched)
+
+    # case progress after every batch
+    calls = []
+    res_progress = exp_fit_windows(x, y, offsets, n_avg=2, k0=0.5, c0=2.0,
+                                   progress=lambda *args: calls.append(args))
+    assert calls == [(1, 3), (2, 3), (3, 3)]
+    for values, values_progress in zip(res, res_progress):
+        assert np.array_equal(values, values_progress)
+
+
+if __name__ == "__main__":
+    pytest.main(["test_lpy_fitting.py"])
@@ -6,9 +6,14 @@ Created on Thu Mar 27 16:08:25 2025
 
 Testing load module
 """
+import io
+import shutil
+import yaml
 import pytest
 import numpy as np
-from lpy import load, extract_shot_number
+from lpy import (load, load_text, load_many, extract_shot_number,
+                 ShotCache)
+from lpy.load import parse_factor, _read_text_columns
 
 def test_extract_shot_number():
     """ Test extract_shot_number function (gets shot numbert from str) """
@@ -28,6 +33,22 @@ def test_extract_shot_number():
     assert 0 == extract_shot_number(None)
 
 
+def test_parse_factor():
+    """ Test parse_factor function (safe evaluation of signal factor) """
+    # case 1 numbers
+    assert parse_factor(-34) == -34.0
+    assert parse_factor(2.5) == 2.5
+    # case 2 expressions
+    assert parse_factor("1000 / 50") == 20.0
+    assert parse_factor("-(2 + 3) * 2 ** 2") == -20.0
+    # case 3 invalid expressions
+    # huge powers and unhashable values are rejected too
+    for factor in ["__import__('os')", "x * 2", "1 / 0", "", "[1]",
+                   "9**9**9", "1e308 * 10", [1]]:
+        with pytest.raises(ValueError):
+            parse_factor(factor)
+
+
 def test_load():
     """ Testing load function in comparison to manually prepared txts """
     test_data_path = "test_data/"
@@ -46,5 +67,127 @@ def test_load():
     assert signals['shot'] == 3008
 
 
+def test_load_t_range():
+    """ Testing load function with time window against full load """
+    test_data_path = "test_data/"
+    signals = load(test_data_path+"3008.yml")
+    signals_win = load(test_data_path+"3008.yml", t_range=(500, 1500))
+
+    time = signals['time']
+    i0 = np.searchsorted(time, 500)
+    i1 = np.searchsorted(time, 1500, side='right')
+
+    assert len(signals_win['time']) == i1 - i0
+    assert np.allclose(signals_win['time'], time[i0:i1])
+    for signame in ['LP.Power', 'LP.09', 'LP.13']:
+        assert np.allclose(signals_win[signame], signals[signame][i0:i1])
+    assert signals_win['shot'] == 3008
+
+    # case window outside of signal is clipped
+    signals_win = load(test_data_path+"3008.yml", t_range=(-10, 1e9))
+    assert np.allclose(signals_win['time'], time)
+
+    # case invalid window
+    with pytest.raises(ValueError):
+        load(test_data_path+"3008.yml", t_range=(1500, 500))
+
+
+def test_load_many(tmp_path):
+    """ Testing parallel load of many shots against load function """
+    test_data_path = "test_data/"
+    with open(test_data_path+"3008.yml", encoding='utf-8') as stream:
+        cfg = yaml.safe_load(stream)
+    signals = load(None, cfg)
+
+    # copies of shot 3008 with other shot numbers
+    shots_dir = tmp_path / "shots"
+    shots_dir.mkdir()
+    for shot in (3001, 3002, 3003):
+        shutil.copy(cfg['tdms_path'], shots_dir / f"T15MD_{shot}.tdms")
+
+    cache = ShotCache(tmp_path / "cache")
+    results = dict(load_many(shots_dir, cfg['signals'], cache=cache,
+                             workers=2))
+
+    assert sorted(results) == [3001, 3002, 3003]
+    for shot, signals_shot in results.items():
+        assert signals_shot['shot'] == shot
+        for signame in ['time', 'LP.Power', 'LP.09', 'LP.13']:
+            assert np.array_equal(signals_shot[signame], signals[signame])
+
+
+def test_load_text(tmp_path):
+    """ Testing load_text function on txt in dashboard export format """
+    time = np.linspace(0, 10, 1001)
+    u = np.sin(time)
+    i = np.cos(time)
+    txt_path = tmp_path / "T15MD_3008.txt"
+    np.savetxt(txt_path, np.column_stack([time, u, i]), fmt='%.6f',
+               delimiter='\t',
+               header='LP.09.time [ms]\tLP.09.U [U]\tLP.09.I [mA]')
+    cfg = {
+        'tdms_path': str(txt_path),
+        'signals': {
+            'LP.Power': {'channel': 'LP.09.U [U]', 'factor': -34},
+            'LP.09': {'channel': 'LP.09.I [mA]', 'factor': '1000 / 50'},
+            'LP.09.FP': {'channel': 'LP.09.I [mA]', 'factor': 1},
+            },
+        }
+
+    # case 1 time from time column
+    signals = load_text(None, cfg)
+    assert signals['shot'] == 3008
+    assert np.allclose(signals['time'], time, atol=1e-6)
+    assert np.allclose(signals['LP.Power'], u * -34, atol=1e-4)
+    assert np.allclose(signals['LP.09'], i * 20, atol=1e-4)
+    assert np.allclose(signals['LP.09.FP'], i, atol=1e-6)
+
+    # case 2 time from rate, no time column
+    np.savetxt(txt_path, np.column_stack([u, i]), fmt='%.6f')
+    cfg['signals'] = {'LP.Power': {'channel': 'col1', 'factor': 1},
+                      'LP.09': {'channel': 'col2', 'factor': 1}}
+    with open(txt_path, 'r+', encoding='utf-8') as stream:
+        content = stream.read()
+        stream.seek(0)
+        stream.write('col1 col2\n' + content)
+    with pytest.raises(ValueError):
+        load_text(None, cfg)
+    cfg['rate'] = 100_000
+    signals = load_text(None, cfg)
+    assert len(signals['time']) == len(time)
+    assert np.isclose(signals['time'][1] - signals['time'][0], 0.01, rtol=1e-2)
+    assert np.allclose(signals['LP.Power'], u, atol=1e-6)
+
+    # case 3 missing column
+    cfg['signals']['LP.13'] = {'channel': 'col3', 'factor': 1}
+    with pytest.raises(ValueError):
+        load_text(None, cfg)
+
+
+def test_read_text_columns():
+    """ Test text parsed by chunks much smaller than lines """
+    rng = np.random.default_rng(0)
+    data = rng.normal(0, 1000, (50, 3))
+    text = io.StringIO()
+    np.savetxt(text, data, fmt='%.9f', delimiter='\t')
+    content = text.getvalue().encode()
+    expected = np.loadtxt(io.BytesIO(content))
+
+    # lines are split between chunks and longer than one chunk, last line
+    # is parsed with and without line break
+    for chunk_size in [7, 13, 1000, len(content)]:
+        for raw in [content, content.rstrip(b'\n')]:
+            columns = _read_text_columns(io.BytesIO(raw), 3, [2, 0],
+                                         chunk_size=chunk_size)
+            assert sorted(columns) == [0, 2]
+            assert np.array_equal(columns[0], expected[:, 0])
+            assert np.array_equal(columns[2], expected[:, 2])
+
+    # empty data and wrong amount of values
+    assert len(_read_text_columns(io.BytesIO(b''), 3, [1], 7)[1]) == 0
+    with pytest.raises(ValueError):
+        _read_text_columns(io.BytesIO(content + b'1 2\n'), 3, [0], 7)
+
+
 if __name__ == "__main__":
     pytest.main(["test_lpy_load.py"])
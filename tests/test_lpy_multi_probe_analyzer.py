@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Testing MultiProbeAnalyzer
+"""
+import pytest
+import numpy as np
+from lpy import load, TeNeAnalyzer, MultiProbeAnalyzer, SpanDetector
+
+
+@pytest.fixture
+def _sample_data():
+    """Load Langmuir probe data for testing."""
+    signals = load("test_data/3008.yml")
+    currents = {'LP.09': signals['LP.09'], 'LP.13': signals['LP.13']}
+    return signals['time'], signals['LP.Power'], currents
+
+
+def test_calc_te_ne(_sample_data, mocker):
+    """ Test results are equal to TeNeAnalyzer of every probe """
+    t, u, currents = _sample_data
+    params = [{'n_avg': 3, 'u_range': (-40, 5)},
+              {'n_avg': 2, 'sweep_direction': 'down', 'smooth_u': (5, 2),
+               'smooth_i': (3, 1), 'te_threshold': 3}]
+    mpa = MultiProbeAnalyzer(t, u, currents)
+    spy = mocker.spy(SpanDetector, 'smooth_voltage')
+    results_all = [mpa.calc_te_ne(parameters) for parameters in params]
+    # voltage is smoothed once for all probes and parameters
+    assert spy.call_count == 1
+
+    for parameters, results in zip(params, results_all):
+        assert list(results) == ['LP.09', 'LP.13']
+        for probe_name, res in results.items():
+            tna = TeNeAnalyzer(t, u, currents[probe_name])
+            expected = tna.calc_te_ne(dict(parameters))
+            for values, values_expected in zip(res, expected):
+                assert np.array_equal(values, values_expected)
+
+    assert (len(mpa.analyzers['LP.13'].cv_plot_data)
+            == len(tna.cv_plot_data))
+
+    # case chosen probes
+    assert list(mpa.calc_te_ne(params[0], probes=['LP.13'])) == ['LP.13']
+
+
+
+def test_calc_te_ne_workers(_sample_data):
+    """ Test probes processed in threads are equal to serial results """
+    t, u, currents = _sample_data
+    parameters = {'n_avg': 3, 'u_range': (-40, 5)}
+    expected = MultiProbeAnalyzer(t, u, currents).calc_te_ne(parameters)
+    results = MultiProbeAnalyzer(t, u, currents).calc_te_ne(parameters,
+                                                            workers=2)
+    assert list(results) == list(expected)
+    for probe_name, res in results.items():
+        for values, values_expected in zip(res, expected[probe_name]):
+            assert np.array_equal(values, values_expected)
+
+
+if __name__ == "__main__":
+    pytest.main(["test_lpy_multi_probe_analyzer.py"])
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Testing parallel execution helpers
+"""
+import os
+import pytest
+from lpy.parallel import map_ordered, chunk_slices, resolve_workers
+
+
+def test_resolve_workers():
+    """ Test workers knob """
+    assert resolve_workers(None) == 1
+    assert resolve_workers(0) == 1
+    assert resolve_workers(3) == 3
+    assert resolve_workers(-1) == (os.cpu_count() or 1)
+
+
+def test_map_ordered():
+    """ Test results are in items order for any workers """
+    items = list(range(20))
+    expected = [item ** 2 for item in items]
+    for workers in [1, 4, -1]:
+        assert map_ordered(lambda x: x ** 2, items, workers) == expected
+    assert map_ordered(abs, [-1, 2, -3], 2, executor='process') == [1, 2, 3]
+    assert not map_ordered(abs, [], 4)
+
+
+def test_map_ordered_progress():
+    """ Test progress after every item and stop by exception """
+    for workers in [1, 2]:
+        calls = []
+        results = map_ordered(abs, [-1, 2, -3], workers,
+                              progress=lambda *args: calls.append(args))
+        assert results == [1, 2, 3]
+        assert calls == [(1, 3), (2, 3), (3, 3)]
+
+    items = []
+    def stop(done, total):
+        if done == 2:
+            raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        map_ordered(items.append, range(5), progress=stop)
+    assert items == [0, 1]
+
+
+def test_chunk_slices():
+    """ Test slices cover whole range without gaps """
+    for size, n_chunks in [(10, 3), (2, 5), (0, 4), (7, 1)]:
+        slices = chunk_slices(size, n_chunks)
+        assert len(slices) <= max(n_chunks, 1)
+        assert [n for chunk in slices
+                for n in range(size)[chunk]] == list(range(size))
+
+
+if __name__ == "__main__":
+    pytest.main(["test_lpy_parallel.py"])
@@ -7,9 +7,9 @@ Created on Fri Mar 21 17:53:05 2025
 
 import pytest
 import numpy as np
-from lpy.processing import (smooth, detect_peaks_iqr, remove_peaks_iqr,
+from lpy.processing import (smooth, smooth_range, detect_peaks_iqr, remove_peaks_iqr,
                             remove_nans, remove_zeros, remove_negatives,
-                            is_valid_positive)
+                            is_valid_positive, nearest_index)
 
 
 def test_is_valid_positive():
@@ -65,6 +65,43 @@ def test_smooth_basic():
     assert np.array_equal(x, smoothed)
 
 
+def test_smooth_engines():
+    """ Test smooth engines give the same result as iterative fftconvolve """
+    rng = np.random.default_rng(0)
+    for size in [2, 5, 100, 5000]:
+        x = rng.normal(size=size).cumsum() + 50
+        # odd and even boxes, box longer than array, many passes
+        for avg, n in [(3, 1), (4, 2), (151, 11), (71, 11), (7, 20)]:
+            expected = smooth(x, avg, n, engine='fft')
+            for engine in ['auto', 'cumsum', 'kernel']:
+                smoothed = smooth(x, avg, n, engine=engine)
+                assert smoothed.shape == expected.shape
+                assert np.allclose(smoothed, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_smooth_range():
+    """ Test smoothing part of array with margins """
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=20000).cumsum()
+    for avg, n in [(151, 11), (71, 11), (5, 2), (1, 1)]:
+        expected = smooth(x, avg, n)
+        for i0, i1 in [(0, 20000), (0, 100), (5000, 7000), (19990, 20000),
+                       (-10, 30000), (100, 100)]:
+            smoothed = smooth_range(x, i0, i1, avg, n)
+            assert np.allclose(smoothed, expected[max(i0, 0):i1],
+                               rtol=1e-9, atol=1e-9)
+
+
+def test_nearest_index():
+    """ Test binary search of nearest value equals full search """
+    x = np.array([0.5, 1.0, 2.0, 4.0, 4.0, 7.0])
+    for value in [-1, 0.5, 0.7, 0.75, 1.6, 3.0, 4.0, 5.4, 5.6, 100]:
+        assert nearest_index(x, value) == np.argmin(np.abs(x - value))
+    assert nearest_index(x[:1], 10) == 0
+    with pytest.raises(ValueError):
+        nearest_index([], 1)
+
+
 def test_detect_peaks_iqr():
     """ Test detect_peaks_iqr function.
         Check if peak on index 3 - value 100.
@@ -7,7 +7,7 @@ Created on Wed Mar 26 16:32:53 2025
 
 import pytest
 import numpy as np
-from lpy import SpanDetector, load
+from lpy import SpanDetector, ChunkedSpanDetector, load
 
 
 @pytest.fixture
@@ -64,6 +64,40 @@ def test_calc_repere_points(_sample_data):
     assert np.isclose(len(detector.di_maxs), 249, atol=1.0)
 
 
+def test_extract_di_extrema(_sample_data):
+    """ Test vectorised di extrema extraction against nested loops """
+    t, u, i = _sample_data
+    detector = SpanDetector(t, u, i)
+
+    def extract_reference(u_mins, extrema, left):
+        """ reference nested loops implementation """
+        res = []
+        for umin in u_mins:
+            for j, ext in enumerate(extrema):
+                if ext > umin:
+                    if j == 0:
+                        continue
+                    res.append(extrema[j-1] if left else extrema[j])
+                    break
+        return np.asarray(res, dtype=int)
+
+    rng = np.random.default_rng(0)
+    extrema_cases = [np.sort(rng.choice(1000, 50, replace=False)),
+                     np.array([5, 15, 25]), np.array([500]), np.array([],
+                                                                  dtype=int)]
+    u_mins_cases = [np.sort(rng.choice(1000, 30, replace=False)),
+                    np.array([0, 4, 5, 6, 30]), np.array([], dtype=int)]
+    for u_mins in u_mins_cases:
+        detector.u_mins = u_mins
+        for extrema in extrema_cases:
+            # pylint: disable=protected-access
+            assert np.array_equal(detector._extract_di_mins(extrema),
+                                  extract_reference(u_mins, extrema, True))
+            # pylint: disable=protected-access
+            assert np.array_equal(detector._extract_di_maxs(extrema),
+                                  extract_reference(u_mins, extrema, False))
+
+
 def test_column_stack_arrays(_sample_data):
     """ Test column_stack_array method """
     t, u, i = _sample_data
@@ -173,6 +207,44 @@ def test_shift_span_boundaries(_sample_data):
     assert l == 20000 and r == 30000
 
 
+def test_shift_spans_boundaries(_sample_data):
+    """ Test vectorised spans shifting against per span shifting """
+    t, u, i = _sample_data
+    detector = SpanDetector(t, u, i)
+    spans = np.array([(20000, 30000), (0, 10), (49990, 50000), (5, 5),
+                      (100, 50)])
+    id_max = 50000
+    shifts = [4000, -4000, 5000, 1e6, -1e6, 0, 20, None]
+    for left_shift in shifts:
+        for right_shift in shifts:
+            # pylint: disable=protected-access
+            res = detector._shift_spans_boundaries(spans, left_shift,
+                                                   right_shift, id_max)
+            # pylint: disable=protected-access
+            expected = [detector._shift_span_boundaries(span, left_shift,
+                                                        right_shift, id_max)
+                        for span in spans]
+            assert res.shape == spans.shape
+            assert np.array_equal(res, expected)
+
+
+def test_chunked_span_detector(_sample_data):
+    """ Test spans found by chunks are equal to spans of whole signals """
+    t, u, i = _sample_data
+    detector = SpanDetector(t, u, i)
+    params = [{}, {'dt_range_te': (0.1, 0.2), 'dt_range_ne': (1, 1.5),
+                   'sweep_direction': 'down'}]
+    for kwargs in params:
+        spans_te, spans_ne = detector.spans(**kwargs)
+        for chunk_size in (5000, 77777, len(t)):
+            chunked = ChunkedSpanDetector(t, u, i, chunk_size=chunk_size)
+            parts = list(chunked.iter_spans(**kwargs))
+            assert np.array_equal(np.concatenate([p[0] for p in parts]),
+                                  spans_te)
+            assert np.array_equal(np.concatenate([p[1] for p in parts]),
+                                  spans_ne)
+
+
 def test_dt_mask(_sample_data):
     """ Test time shifting spans boundaries """
     t, u, i = _sample_data
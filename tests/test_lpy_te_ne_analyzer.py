@@ -5,10 +5,13 @@ Created on Thu Mar 27 17:05:54 2025
 @author: Student
 """
 
+import warnings
 import pytest
 import numpy as np
 from scipy.constants import physical_constants
-from lpy import load, TeNeAnalyzer, PROBE_AREA_DEFAULT
+from lpy import (load, TeNeAnalyzer, TeNeResults, SpanDetector,
+                 PROBE_AREA_DEFAULT)
+from lpy.fitting import FIT_CONVERGED, FIT_FAILED
 
 
 @pytest.fixture
@@ -63,6 +66,287 @@ def test_u_mask(_sample_data):
     assert np.isclose(np.max(u_new), 8.7, atol=0.1)
 
 
+def test_te_linear_fit_windows(_sample_data):
+    """ Test batched linear fit gives the same results as per window fit """
+    t, u, i = _sample_data
+    tna = TeNeAnalyzer(t, u, i)
+    tna.calc_te_ne({'n_avg': 3, 'u_range': (-40, 5)})
+    n_avg, u_range = 3, (-40, 5)
+
+    # pylint: disable=protected-access
+    te, info = tna._te_linear_fit_windows(n_avg, u_range)
+    assert len(te) == len(tna.spans_te) - n_avg + 1
+    assert info.shape == (len(te), 4)
+
+    for n_win in range(len(te)):
+        idx = np.concatenate([np.arange(*span) for span
+                              in tna.spans_te[n_win:n_win + n_avg]])
+        # pylint: disable=protected-access
+        u_m, i_m = tna._u_mask(tna.u_smoothed[idx], tna.i_smoothed[idx],
+                               u_range)
+        u_m, i_m = u_m[i_m > 0], i_m[i_m > 0]
+        if len(u_m) < 2:
+            assert te[n_win] == 0
+            continue
+        # pylint: disable=protected-access
+        te_win, info_win = tna._te_linear_fit(u_m, i_m)
+        assert np.isclose(te[n_win], te_win, rtol=1e-6)
+        assert np.allclose(info[n_win], info_win, rtol=1e-3)
+
+
+@pytest.mark.parametrize('u_range', [(-40, 5), (0, 0), (-60, -10)])
+def test_te_exponential_fast(_sample_data, u_range):
+    """ Test fast exponential fit against curve_fit of every window """
+    t, u, i = _sample_data
+    parameters = {'n_avg': 3, 'u_range': u_range}
+    res_t, te, ne, info = TeNeAnalyzer(t, u, i).calc_te_ne(
+        {**parameters, 'fit_method': 'exponential'})
+
+    tna = TeNeAnalyzer(t, u, i)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        res_t_fast, te_fast, ne_fast, info_fast = tna.calc_te_ne(
+            {**parameters, 'fit_method': 'exponential_fast'})
+    assert len(tna.fit_status) == len(te_fast)
+    assert np.allclose(res_t_fast, res_t)
+
+    # converged windows are minimums within bounds, ion current only
+    # windows (k is not determined) are failed
+    converged = tna.fit_status == FIT_CONVERGED
+    assert np.array_equal(te_fast > 0, converged)
+    assert np.all(info_fast[converged, 2] < 20)
+    if u_range == (-60, -10):
+        assert np.all(tna.fit_status == FIT_FAILED)
+        return
+    assert np.all(converged)
+    assert np.allclose(te_fast, te, rtol=1e-2)
+    assert np.allclose(ne_fast, ne, rtol=1e-2)
+    assert np.allclose(info_fast, info, rtol=1e-2)
+
+
+def test_calc_te_ne_smoothing(_sample_data):
+    """ Test signals are not modified and smoothing is reused """
+    t, u, i = _sample_data
+    u_raw, i_raw = u.copy(), i.copy()
+    parameters = {'n_avg': 2, 'smooth_u': (5, 2), 'smooth_i': (3, 1)}
+    tna = TeNeAnalyzer(t, u, i)
+    expected = tna.calc_te_ne(parameters)
+    u_smoothed = tna.u_smoothed
+    assert tna.u is u and tna.i is i
+    assert np.array_equal(u, u_raw) and np.array_equal(i, i_raw)
+
+    # other parameters recalculate changed smoothing only
+    tna.calc_te_ne({**parameters, 'smooth_i': (7, 1)})
+    assert tna.u_smoothed is u_smoothed
+    assert not np.array_equal(tna.i_smoothed,
+                              tna.smoothed(i, *parameters['smooth_i']))
+
+    # repeated call is equal to call of new analyzer
+    results = tna.calc_te_ne(parameters)
+    assert tna.u_smoothed is u_smoothed
+    for values, values_expected in zip(results, expected):
+        assert np.array_equal(values, values_expected)
+
+
+def test_calc_te_ne_stages(_sample_data, mocker):
+    """ Test only stages after changed parameters are recalculated """
+    t, u, i = _sample_data
+    tna = TeNeAnalyzer(t, u, i)
+    spy_spans = mocker.spy(SpanDetector, 'spans')
+    spy_fits = mocker.spy(TeNeAnalyzer, '_fit_windows')
+    # parameters, spans and fits are recalculated
+    params = [({'n_avg': 3, 'u_range': (-40, 5)}, True, True),
+              ({'n_avg': 3, 'u_range': (-40, 5), 'te_threshold': 3},
+               False, False),
+              ({'n_avg': 3, 'u_range': (-40, 5), 'probe_area': 3},
+               False, False),
+              ({'n_avg': 3, 'u_range': (-30, 5)}, False, True),
+              ({'n_avg': 2, 'u_range': (-30, 5)}, False, True),
+              ({'n_avg': 2, 'smooth_i': (3, 1)}, False, True),
+              ({'n_avg': 2, 'sweep_direction': 'down'}, True, True),
+              ({'n_avg': 2, 'sweep_direction': 'down'}, False, False)]
+    for parameters, new_spans, new_fits in params:
+        expected = TeNeAnalyzer(t, u, i).calc_te_ne(dict(parameters))
+        spy_spans.reset_mock()
+        spy_fits.reset_mock()
+        results = tna.calc_te_ne(dict(parameters))
+        assert spy_spans.call_count == new_spans
+        assert spy_fits.call_count == new_fits
+        for values, values_expected in zip(results, expected):
+            assert np.array_equal(values, values_expected)
+
+
+def test_calc_te_ne_none_ranges(_sample_data):
+    """ Test ranges given as None (no voltage range, spans not adjusted) """
+    t, u, i = _sample_data
+    parameters = {'n_avg': 3, 'u_range': None, 'dt_range_ne': None,
+                  'dt_range_te': None}
+    tna = TeNeAnalyzer(t, u, i)
+    results = tna.calc_te_ne(dict(parameters))
+    expected = TeNeAnalyzer(t, u, i).calc_te_ne({'n_avg': 3,
+                                                 'u_range': (0, 0)})
+    assert np.array_equal(results.te, expected.te)
+    assert np.array_equal(tna.spans_ne, tna.spandet.spans_ne(None))
+    # cached stages are reused with None keys
+    assert np.array_equal(tna.calc_te_ne(dict(parameters)).data,
+                          results.data)
+
+
+def test_calc_te_ne_progress(_sample_data):
+    """ Test progress callback while fitting and cancellation by exception """
+    t, u, i = _sample_data
+    for fit_method in ['linear', 'exponential_fast']:
+        parameters = {'n_avg': 3, 'u_range': (-40, 5),
+                      'fit_method': fit_method}
+        expected = TeNeAnalyzer(t, u, i).calc_te_ne(dict(parameters))
+        n_windows = len(expected)
+        calls = []
+        tna = TeNeAnalyzer(t, u, i)
+
+        def cancel(done, total):
+            calls.append((done, total))
+            if done > 0:
+                raise KeyboardInterrupt
+
+        # cancelled after first part of windows is fitted
+        with pytest.raises(KeyboardInterrupt):
+            tna.calc_te_ne(dict(parameters), progress=cancel)
+        assert 0 < calls[-1][0] < n_windows
+
+        calls.clear()
+        results = tna.calc_te_ne(dict(parameters),
+                                 progress=lambda *args: calls.append(args))
+        assert calls[0] == (0, n_windows)
+        assert calls[-1] == (n_windows, n_windows)
+        # progress is reported in parts while fitting
+        done = [call[0] for call in calls]
+        assert len(set(done)) > 10 and done == sorted(done)
+        for values, values_expected in zip(results, expected):
+            assert np.array_equal(values, values_expected)
+
+
+def test_calc_te_ne_workers(_sample_data):
+    """ Test parallel fits of windows are equal to serial fits """
+    t, u, i = _sample_data
+    for fit_method in ['exponential', 'exponential_fast']:
+        parameters = {'n_avg': 3, 'u_range': (-40, 5),
+                      'fit_method': fit_method}
+        expected = TeNeAnalyzer(t, u, i).calc_te_ne(dict(parameters))
+        results = TeNeAnalyzer(t, u, i).calc_te_ne(dict(parameters),
+                                                   workers=2)
+        for values, values_expected in zip(results, expected):
+            assert np.array_equal(values, values_expected)
+
+
+def test_iter_te_ne(_sample_data):
+    """ Test streaming results are equal to results of whole signals """
+    t, u, i = _sample_data
+    params = [{'n_avg': 3, 'u_range': (-40, 5)},
+              {'n_avg': 5, 'u_range': (-40, 5), 'sweep_direction': 'down',
+               'dt_range_te': (0.1, 0.2), 'te_threshold': 3},
+              {'n_avg': 2, 'smooth_u': (5, 2), 'smooth_i': (3, 1)}]
+    for parameters in params:
+        expected = TeNeAnalyzer(t, u, i).calc_te_ne(dict(parameters))
+        tna = TeNeAnalyzer(t, u, i)
+        parts = list(tna.iter_te_ne(dict(parameters), chunk_size=20000))
+        assert len(parts) > 1
+        # signals are not modified
+        assert tna.u is u and tna.i is i
+        res_t, te, ne, info = TeNeResults.concatenate(parts)
+        assert np.allclose(res_t, expected.t)
+        assert np.allclose(te, expected.te)
+        assert np.allclose(ne, expected.ne)
+        assert np.allclose(info, expected.info, rtol=1e-3)
+
+
+def test_te_ne_results(_sample_data):
+    """ Test columns of results and their unpacking as tuple """
+    t, u, i = _sample_data
+    parameters = {'n_avg': 3, 'u_range': (-40, 5), 'te_threshold': 3}
+    tna = TeNeAnalyzer(t, u, i)
+    results = tna.calc_te_ne(dict(parameters))
+    assert isinstance(results, TeNeResults)
+    assert results.data.shape == (9, len(results)) == (9, len(results.t))
+    res_t, te, ne, info = results
+    # items are views of columns
+    assert np.shares_memory(te, results.data)
+    assert np.array_equal(info, np.column_stack(
+        (results.k, results.c, results.kerr, results.cerr)))
+    assert all(np.array_equal(item, expected) for item, expected in
+               zip((res_t, te, ne, info),
+                   (results.t, results.te, results.ne, results.info)))
+    assert np.all((te == 0) | (te <= 3))
+    assert np.all(info[te == 0] == 0)
+    # time, samples and status are kept by threshold
+    assert np.all(res_t > 0)
+    windows = tna.cv_plot_data.windows
+    assert np.array_equal(results.n_samples,
+                          windows['end'] - windows['start'])
+    assert np.array_equal(results.status > 0,
+                          tna.calc_te_ne({**parameters, 'te_threshold': 0}).te
+                          > 0)
+    assert set(np.unique(results.status)) <= {FIT_CONVERGED, FIT_FAILED}
+
+    # streaming results are concatenated
+    parts = list(tna.iter_te_ne(dict(parameters), chunk_size=20000))
+    concatenated = TeNeResults.concatenate(parts)
+    assert concatenated.data.shape == results.data.shape
+    assert np.allclose(concatenated.te, results.te)
+
+    # empty window gives zeros
+    spans_te = tna.spans_te.copy()
+    spans_te[5, 1] = spans_te[5, 0]
+    tna = TeNeAnalyzer(t, u, i)
+    tna.spans_te, tna.spans_ne = spans_te, spans_te
+    # pylint: disable=protected-access
+    results, _ = tna._calc_windows(tna._get_parameters({}))
+    assert np.all(results.data[:, 5] == [0, 0, 0, 0, 0, 0, 0, 0, FIT_FAILED])
+    assert results.info.shape == (len(spans_te), 4)
+    assert np.all(results.te[[4, 6]] > 0)
+
+
+def test_cv_plot_data(_sample_data):
+    """ Test Current-Voltage Plot data of windows taken on request """
+    t, u, i = _sample_data
+    n_avg, u_range = 3, (-40, 5)
+    tna = TeNeAnalyzer(t, u, i)
+    _, _, _, info = tna.calc_te_ne({'n_avg': n_avg, 'u_range': u_range})
+    cv_plot_data = tna.cv_plot_data
+    assert len(cv_plot_data) == len(info)
+    # only ranges and fits of windows are stored
+    assert cv_plot_data.windows.nbytes == 40 * len(info)
+
+    for n_win, window in enumerate(cv_plot_data):
+        idx = np.concatenate([np.arange(*span) for span
+                              in tna.spans_te[n_win:n_win + n_avg]])
+        u_wide, i_wide, u_m, i_m, k, c, time_mean = window
+        assert np.array_equal(u_wide, tna.u_smoothed[idx])
+        assert np.array_equal(i_wide, tna.i_smoothed[idx])
+        mask = (u_range[0] < u_wide) & (u_wide < u_range[1])
+        assert np.array_equal(u_m, u_wide[mask])
+        assert np.array_equal(i_m, i_wide[mask])
+        assert (k, c) == tuple(info[n_win][:2])
+        assert time_mean == pytest.approx(t[idx].mean())
+    assert cv_plot_data[-1][4] == info[-1][0]
+    with pytest.raises(IndexError):
+        cv_plot_data[len(info)] # pylint: disable=pointless-statement
+
+
+def test_find_nearest_info(_sample_data):
+    """ Test nearest span by binary search equals full search """
+    t, u, i = _sample_data
+    tna = TeNeAnalyzer(t, u, i)
+    tna.calc_te_ne({'n_avg': 3})
+    span_times = np.array([t[span[0]:span[1]].mean()
+                           for span in tna.spans_te])
+    assert np.allclose(tna.span_times(), span_times)
+    assert tna.span_times() is tna.span_times()
+    for time in np.linspace(t[0] - 10, t[-1] + 10, 777):
+        assert (tna.find_nearest_info(time)
+                == np.nanargmin(np.abs(span_times - time)))
+    assert tna.find_nearest_info(None) is None
+
+
 def test_ne_formula(_sample_data):
     """ Test ne formula method (formula for calculation ne) """
     t, u, i = _sample_data